@@ -1,5 +1,7 @@
 """Nox sessions for building and managing the Carcassonne project documentation."""
 
+from pathlib import Path
+
 import nox
 
 
@@ -8,3 +10,11 @@ def docs(session: nox.Session) -> None:
     """Build the documentation."""
     session.install("-r", "docs/requirements.txt")
     session.run("sphinx-build", "docs", "docs/_build")
+
+
+@nox.session(python="3.11")
+def bench(session: nox.Session) -> None:
+    """Run the benchmarks, compare with benchmarks.json if it exists."""
+    session.install(".")
+    args = ["--baseline", "benchmarks.json"] if Path("benchmarks.json").exists() else []
+    session.run("carcassonne_bench", *args, *session.posargs)
@@ -7,28 +7,66 @@ It includes functions to:
 Attributes:
     __version__ (str): The version of the module.
     GFX_DIR (str): The directory where graphics files are stored.
+    asset_cache (AssetCache): The process-wide cache of parsed graphics files.
     logger (logging.Logger): The logger for this module.
 """
 
-# ruff: noqa: N806
+from __future__ import annotations
 
+import hashlib
 import logging
 import random
 import xml.etree.ElementTree as ET
-from collections.abc import Iterable
 from pathlib import Path
-from typing import ClassVar
+from typing import TYPE_CHECKING, ClassVar, Self, TextIO
+
+from .archive import ArchiveWriter, archive_member, is_archive
+from .assets import AssetCache
+from .compact import SVG_NS, compact_tree, drop_styles, style_element, tostring
+from .compact import enable as enable_compact
+from .compact import precision as compact_precision
+from .geometry import PATH_STYLE, PATHS
+from .inputs import expand_inputs, load_tiles
+from .stats import enable as enable_stats
+from .stats import stage
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from .catalog import CardSpec
+    from .pages import Page
 
 __version__ = "0.1.0"
 GFX_DIR = Path(__file__).resolve().parent / ".." / "gfx"
 logger = logging.getLogger()
+asset_cache = AssetCache()
 
 
 def get_gfx(filename: str) -> ET.Element:
     """Open `filename` in GFX_DIR and return the ELementTree element with the id gfx."""
-    logging.debug(f"Reading graphics from {filename}")
-    tree = ET.parse(GFX_DIR / filename)  # noqa: S314
-    return tree.find(".//*[@id='gfx']")
+    logging.debug("Reading graphics from %s", filename)
+    with stage("gfx"):
+        return asset_cache.find(GFX_DIR / filename, "gfx")
+
+
+def get_template(filename: str = "tile.svg") -> ET.ElementTree:
+    """Return a fresh copy of the template `filename` in GFX_DIR."""
+    with stage("template"):
+        return asset_cache.tree(GFX_DIR / filename)
+
+
+def warm_worker(memory: bool | None, precision: int | None) -> None:
+    """Set up a worker process drawing cards, like the parent, and load the tile template once.
+
+    Args:
+        memory (bool): None if statistics are off, else if memory is traced.
+        precision (int): The precision of compact output, None if output is not compacted.
+    """
+    if memory is not None:
+        enable_stats(memory=memory)
+    if precision is not None:
+        enable_compact(precision)
+    get_template()
 
 
 def get_element(tree: ET.ElementTree, element: str) -> ET.Element:
@@ -41,7 +79,7 @@ def get_element(tree: ET.ElementTree, element: str) -> ET.Element:
 
 def write_tile(filename: str, gfx: Iterable) -> None:
     """Create a tile with the graphics in gfx added."""
-    tree = ET.parse(GFX_DIR / "tile.svg")  # noqa: S314
+    tree = get_template()
     tile = get_element(tree, "tile")
     for g in gfx:
         if g:
@@ -49,26 +87,223 @@ def write_tile(filename: str, gfx: Iterable) -> None:
     tree.write(filename)
 
 
-def tile_cards(filename: str, cards: str, per_row: int) -> None:
-    """Tile the graphics in cards as one file."""
-    tree = ET.parse(GFX_DIR / "tile.svg")  # noqa: S314
-    tile = get_element(tree, "tile")
-    for n, card in enumerate(cards):
-        card_tree = ET.parse(card)  # noqa: S314
-        element = get_element(card_tree, "tile")
-        group = ET.Element(
-            "{http://www.w3.org/2000/svg}g",
-            transform=f"translate({(n%per_row)*60} {(n//per_row)*60})",
-        )
-        group.append(element)
-        tile.append(group)
+def sheet_position(n: int, per_row: int) -> str:
+    """Return the transform that moves a card to position n on a sheet."""
+    return f"translate({(n % per_row) * 60} {(n // per_row) * 60})"
+
+
+def place_card(element: ET.Element, n: int, per_row: int) -> ET.Element:
+    """Return element wrapped in a group that moves it to position n on a sheet."""
+    group = ET.Element(f"{{{SVG_NS}}}g", transform=sheet_position(n, per_row))
+    group.append(element)
+    return group
+
+
+def write_tree(filename: str, tree: ET.ElementTree) -> None:
+    """Like tree.write(filename), recording serialization and writing as separate stages.
 
+    If filename is a zip or tar archive, tree is written as the only file in it. A link left
+    by a deduplicated build is replaced, not written through.
+    """
+    with stage("serialize") as serialize:
+        data = tostring(tree.getroot())
+        serialize.size = len(data)
+    if is_archive(filename):
+        with ArchiveWriter(filename) as archive:
+            archive.add(archive_member(filename), data)
+        return
+    with stage("write") as write:
+        Path(filename).unlink(missing_ok=True)
+        Path(filename).write_bytes(data)
+        write.size = len(data)
+
+
+def size_sheet(tree: ET.ElementTree, count: int, per_row: int) -> None:
+    """Set the size of tree to fit count cards, per_row on each row."""
     width = per_row * 60
-    height = ((len(cards) // per_row) + 1) * 60
+    height = ((count // per_row) + 1) * 60
     tree.getroot().attrib["width"] = f"{width}mm"
     tree.getroot().attrib["height"] = f"{height}mm"
     tree.getroot().attrib["viewBox"] = f"0 0 {width} {height}"
-    tree.write(filename)
+
+
+def size_page(tree: ET.ElementTree, page: Page) -> None:
+    """Set the size of tree to the paper size of page, with the cards inside its margins."""
+    tree.getroot().attrib["width"] = f"{page.width:g}mm"
+    tree.getroot().attrib["height"] = f"{page.height:g}mm"
+    tree.getroot().attrib["viewBox"] = f"{-page.margin:g} {-page.margin:g} {page.width:g} {page.height:g}"
+
+
+def use_symbols(element: ET.Element, symbols: dict[str, ET.Element]) -> None:
+    """Replace the feature graphics in element with <use> of a <symbol> in symbols.
+
+    Symbols are named by a digest of their content, so the same graphic always gets
+    the same name. New symbols are added to symbols.
+    """
+    for parent in element.iter():
+        for i, child in enumerate(parent):
+            if child.get("id") != "gfx":
+                continue
+            content = ET.tostring(child)
+            name = f"gfx-{hashlib.sha256(content).hexdigest()[:12]}"
+            if name not in symbols:
+                symbol = ET.Element(f"{{{SVG_NS}}}symbol", id=name, overflow="visible")
+                symbol.append(ET.fromstring(content))  # noqa: S314
+                del symbol[0].attrib["id"]
+                symbols[name] = symbol
+            parent[i] = ET.Element(
+                f"{{{SVG_NS}}}use",
+                {"href": f"#{name}", "{http://www.w3.org/1999/xlink}href": f"#{name}"},
+            )
+
+
+def compact_sheet(tree: ET.ElementTree, precision: int | None) -> None:
+    """Compact the template of a sheet and define the shared styles in it, if precision is not None."""
+    if precision is not None:
+        compact_tree(tree.getroot(), precision)
+        tree.getroot().find(f"{{{SVG_NS}}}defs").append(style_element())
+
+
+def compact_card(element: ET.Element, precision: int | None) -> None:
+    """Compact a card for a sheet compacted by compact_sheet(), if precision is not None."""
+    if precision is not None:
+        compact_tree(element, precision)
+        drop_styles(element)
+
+
+def tile_cards(filename: str, cards: list[str], per_row: int, *, symbols: bool = False, threads: int = 4) -> None:
+    """Tile the graphics in cards as one file.
+
+    Cards may be files, archives, directories, globs or list files, see inputs.py, read on threads
+    threads. filename may be an archive to write the sheet in. With symbols each distinct feature
+    graphic is defined once and used by the cards. Identical cards, like the copies of a build with
+    uniform copies, are parsed once and placed many times.
+    """
+    cards = expand_inputs(cards)
+    precision = compact_precision()
+    tree = get_template()
+    compact_sheet(tree, precision)
+    tile = get_element(tree, "tile")
+    defs = {}
+    parsed: dict[bytes, ET.Element] = {}
+    for n, (data, element) in enumerate(load_tiles(cards, threads, parsed)):
+        if data not in parsed:
+            compact_card(element, precision)
+            if symbols:
+                use_symbols(element, defs)
+            parsed[data] = element
+        tile.append(place_card(parsed[data], n, per_row))
+
+    if defs:
+        tree.getroot().find(f"{{{SVG_NS}}}defs").extend(defs.values())
+    size_sheet(tree, len(cards), per_row)
+    write_tree(filename, tree)
+
+
+class SheetWriter:
+    """Write a sheet of cards to a file one card at a time.
+
+    The size of the sheet is written first, so the number of cards must be known
+    up front, or the sheet is a page of a fixed paper size. Each card carries its
+    own namespace declarations. With symbols, the feature graphics are replaced by
+    <use> and defined once at the end. The sheet is written to a file name or an
+    open text file, which is left open.
+
+    >>> import tempfile
+    >>> with tempfile.TemporaryDirectory() as output_dir, SheetWriter(f"{output_dir}/sheet.svg", 2, 5) as sheet:
+    ...     sheet.add(get_element(get_template(), "tile"))
+    ...     sheet.add(get_element(get_template(), "tile"))
+    """
+
+    def __init__(
+        self, filename: str | TextIO, count: int, per_row: int, *, symbols: bool = False, page: Page | None = None
+    ) -> None:
+        """Prepare a sheet for count cards, per_row on each row, in filename, sized to page if given."""
+        self.filename = filename
+        self.per_row = per_row
+        self.placed = 0
+        self.symbols = {} if symbols else None
+        self.precision = compact_precision()
+
+        tree = get_template()
+        compact_sheet(tree, self.precision)
+        if page is None:
+            size_sheet(tree, count, per_row)
+        else:
+            size_page(tree, page)
+        marker = "cards"
+        get_element(tree, "tile").append(ET.Comment(marker))
+        self.head, self.tail = tostring(tree.getroot(), encoding="unicode").split(f"<!--{marker}-->")
+
+    def __enter__(self) -> Self:
+        """Open the file and write the head of the sheet."""
+        if isinstance(self.filename, str):
+            self.file = Path(self.filename).open("w", encoding="utf-8")
+        else:
+            self.file = self.filename
+        self.file.write("<?xml version='1.0' encoding='utf-8'?>\n")
+        self.file.write(self.head)
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        """Write the symbols and the tail of the sheet and close the file."""
+        if self.symbols:
+            defs = ET.Element(f"{{{SVG_NS}}}defs")
+            defs.extend(self.symbols.values())
+            self.file.write(tostring(defs, encoding="unicode"))
+        self.file.write(self.tail)
+        if isinstance(self.filename, str):
+            self.file.close()
+
+    def add(self, element: ET.Element) -> None:
+        """Place element in the next free position of the sheet."""
+        compact_card(element, self.precision)
+        if self.symbols is not None:
+            use_symbols(element, self.symbols)
+        with stage("serialize") as serialize:
+            placed = tostring(place_card(element, self.placed, self.per_row), encoding="unicode")
+            serialize.size = len(placed)
+        self.write(placed)
+
+    def write(self, placed: str, symbols: dict[str, str] | None = None) -> None:
+        """Write an already placed and serialized card, taking up the next position of the sheet.
+
+        Args:
+            placed (str): The serialized card.
+            symbols (dict): The serialized symbols the card uses, by name.
+        """
+        with stage("write") as write:
+            self.file.write(placed)
+            write.size = len(placed)
+        self.placed += 1
+        for name, symbol in (symbols or {}).items():
+            if name not in self.symbols:
+                self.symbols[name] = ET.fromstring(symbol)  # noqa: S314
+
+    def skip(self) -> None:
+        """Leave the next position of the sheet empty."""
+        self.placed += 1
+
+
+def stream_cards(  # noqa: PLR0913
+    filename: str | TextIO,
+    cards: list[str],
+    per_row: int,
+    *,
+    symbols: bool = False,
+    page: Page | None = None,
+    threads: int = 4,
+) -> None:
+    """Tile the graphics in cards as one file, writing each card as soon as it is read.
+
+    Only the few cards read ahead by the threads are held in memory. Cards may be files,
+    archives, directories, globs or list files, see inputs.py. With page the file is sized
+    as that page.
+    """
+    cards = expand_inputs(cards)
+    with SheetWriter(filename, len(cards), per_row, symbols=symbols, page=page) as sheet:
+        for _, element in load_tiles(cards, threads):
+            sheet.add(element)
 
 
 class Card:
@@ -98,12 +333,39 @@ class Card:
         "W": ("╺", 2),
     }
 
-    def __init__(self, name: str, output_dir: str = "tiles", **args: dict[str, any]) -> None:
+    gfx: ClassVar[dict] = {
+        "abbey": "Abbey.svg",
+        "cathedral": "Cathedral.svg",
+        "cloth": "Cloth.svg",
+        "dragon": "Dragon.svg",
+        "grain": "Grain.svg",
+        "inn": "Inn.svg",
+        "lake": "Lake.svg",
+        "monastery": "Monastery.svg",
+        "pigs": "Pigs.svg",
+        "portal": "Portal.svg",
+        "princess": "Princess.svg",
+        "shield": "Shield.svg",
+        "shrine": "Shrine.svg",
+        "spring": "Spring.svg",
+        "tower": "Tower.svg",
+        "vulcano": "Vulcano.svg",
+        "wine": "Wine.svg",
+    }
+
+    def __init__(
+        self, name: str, output_dir: str = "tiles", copy: int = 1, seed: str = "", **args: dict[str, any]
+    ) -> None:
         """Initialize a new Carcassonne card.
 
+        The random geometry of the card is seeded from its attributes, copy and seed, so
+        the same card always looks the same.
+
         Args:
             name (str): The name of the card.
             output_dir (str): The directory where the card's SVG file will be saved.
+            copy (int): Which copy of the card this is.
+            seed (str): Global seed, change it to get a new look for every card.
             **args (dict): Additional attributes for the card.
         """
         self.roads = ""
@@ -138,257 +400,85 @@ class Card:
             else:
                 msg = f"{self.__class__.__name__} have no attribute {attr}"
                 raise AttributeError(msg)
-
-        self.tile = ET.parse(GFX_DIR / "tile.svg")  # noqa: S314
+        self.edges = (tuple(self.roads.split()), tuple(self.city.split()), tuple(self.river.split()))
+        self._prepare(copy, seed)
+
+    @classmethod
+    def from_spec(cls, name: str, spec: CardSpec, output_dir: str = "tiles", copy: int = 1, seed: str = "") -> Card:
+        """Create a card from a compiled and already validated card spec, see catalog.CardSpec."""
+        card = cls.__new__(cls)
+        card.__dict__.update(spec.attributes)
+        card.name = name
+        card.output_dir = output_dir
+        card.edges = (spec.roads, spec.city, spec.river)
+        card._prepare(copy, seed)  # noqa: SLF001
+        return card
+
+    def _prepare(self, copy: int, seed: str) -> None:
+        """Seed the card and load its template."""
+        self.random = random.Random(f"{seed}:{self.seed}:{copy}")
+        self.tile = get_template()
         self.features = get_element(self.tile, "tile")
 
-    def draw_roads(self, direction: str) -> None:
-        """Draw the roads on the card."""
-        logging.debug(f"Adding {direction} Road to {self.name}")
-        W1 = (0, 22.5)
-        W2 = (0, 27.5)
-        E1 = (50, 22.5)
-        E2 = (50, 27.5)
-        S1 = (22.5, 50)
-        S2 = (27.5, 50)
-        N1 = (22.5, 0)
-        N2 = (27.5, 0)
+    def draw_path(self, kind: str, direction: str) -> None:
+        """Draw a road, river or city path on the card."""
         glyph, rotation = self.direction[direction]
-        if glyph == "╺":
-            a = (random.random() * 5 + 22.5, random.random() * 10 + 20)
-
-            path = f"""M {E1[0]} {E1[1]}
-                    C {E1[0]-5} {E1[1]} {a[0]+5} {(a[1]-2.5+E1[1])/2} {a[0]} {a[1]-2.5}
-                    Q {a[0]-5} {a[1]} {a[0]} {a[1]+2.5}
-                    C {a[0]+5} {(a[1]+2.5+E2[1])/2} {E2[0]-5} {E2[1]} {E2[0]} {E2[1]}
-                    """
-        elif glyph == "┗":
-            a = (random.random() * 10 + 20, random.random() * 10 + 20)
-
-            path = f"""M {N1[0]} {N1[1]}
-                    Q {a[0]} {a[1]} {E2[0]} {E2[1]}
-                    M {N2[0]} {N2[1]}
-                    Q {a[0]+4} {a[1]-4} {E1[0]} {E1[1]}
-                    """
-
-        elif glyph == "┃":
-            a = (random.random() * 10 + 17.5, random.random() * 10 + 20)
-
-            path = f"""M {N1[0]} {N1[1]}
-                    Q {a[0]} {a[1]} {S1[0]} {S1[1]}
-                    M {N2[0]} {N2[1]}
-                    Q {a[0]+5} {a[1]} {S2[0]} {S2[1]}
-                    """
-
-        elif glyph == "┳":
-            a = (random.random() * 10 + 20, random.random() * 10 + 22.5)
-
-            path = f"""M {W1[0]} {W1[1]}
-                    Q {a[0]-5} {a[1]-5} {E1[0]} {E1[1]}
-                    M {W2[0]} {W2[1]}
-                    C {a[0]-2.5} {a[1]} {a[0]-2.5} {a[1]} {S1[0]} {S1[1]}
-                    M {S2[0]} {S2[1]}
-                    C {a[0]+2.5} {a[1]} {a[0]+2.5} {a[1]} {E2[0]} {E2[1]}
-                    """
-        elif glyph == "╋":
-            a = (random.random() * 20 + 15, random.random() * 20 + 15)
-
-            path = f"""M {W2[0]} {W2[1]}
-                    C {a[0]-2.5} {a[1]+2.5} {a[0]-2.5} {a[1]+2.5} {S1[0]} {S1[1]}
-                    M {S2[0]} {S2[1]}
-                    C {a[0]+2.5} {a[1]+2.5} {a[0]+2.5} {a[1]+2.5} {E2[0]} {E2[1]}
-                    M {E1[0]} {E1[1]}
-                    C {a[0]+2.5} {a[1]-2.5} {a[0]+2.5} {a[1]-2.5} {N2[0]} {N2[1]}
-                    M {N1[0]} {N1[1]}
-                    C {a[0]-2.5} {a[1]-2.5} {a[0]-2.5} {a[1]-2.5} {W1[0]} {W1[1]}
-                    """
-
+        template = PATHS[kind].get(glyph)
+        if template is None:
+            logging.error(f"Strange glyph {glyph} when adding {direction} {kind} to {self.name}")
+            path = ""
         else:
-            logging.error(f"Strange glyph {glyph} when adding {direction} road to {self.name}")
+            with stage("paths"):
+                path = template.render(self.random)
         road = ET.Element(
-            "{http://www.w3.org/2000/svg}path",
-            style="fill:none;stroke:#000000;stroke-width:0.264583px;stroke-linecap:butt;stroke-linejoin:miter;stroke-opacity:1",
+            f"{{{SVG_NS}}}path",
+            style=PATH_STYLE,
             d=path,
             id=f"road{direction}",
-            transform=f"rotate({rotation*90} 25 25)",
+            transform=f"rotate({rotation * 90} 25 25)",
         )
         self.features.append(road)
 
+    def draw_roads(self, direction: str) -> None:
+        """Draw the roads on the card."""
+        logging.debug("Adding %s Road to %s", direction, self.name)
+        self.draw_path("road", direction)
+
     def draw_river(self, direction: str) -> None:
         """Draw the river on the card."""
-        logging.debug(f"Adding {direction} River to {self.name}")
-        W1 = (0, 20)
-        W2 = (0, 30)
-        E1 = (50, 20)
-        E2 = (50, 30)
-        S1 = (20, 50)
-        S2 = (30, 50)
-        N1 = (20, 0)
-        N2 = (30, 0)
-        glyph, rotation = self.direction[direction]
-        if glyph == "╺":
-            a = (random.random() * 5 + 22.5, random.random() * 10 + 20)
-
-            path = f"""M {E1[0]} {E1[1]}
-                    C {E1[0]-5} {E1[1]} {a[0]+5} {a[1]-5} {a[0]} {a[1]-5}
-                    Q {a[0]-10} {a[1]} {a[0]} {a[1]+5}
-                    C {a[0]+5} {a[1]+5} {E2[0]-5} {E2[1]} {E2[0]} {E2[1]}
-                    """
-        elif glyph == "┗":
-            a = (random.random() * 10 + 20, random.random() * 10 + 20)
-
-            path = f"""M {N1[0]} {N1[1]}
-                    Q {a[0]} {a[1]} {E2[0]} {E2[1]}
-                    M {N2[0]} {N2[1]}
-                    Q {a[0]+8} {a[1]-8} {E1[0]} {E1[1]}
-                    """
-
-        elif glyph == "┃":
-            a = (random.random() * 10 + 17.5, random.random() * 10 + 20)
-
-            path = f"""M {N1[0]} {N1[1]}
-                    Q {a[0]} {a[1]} {S1[0]} {S1[1]}
-                    M {N2[0]} {N2[1]}
-                    Q {a[0]+10} {a[1]} {S2[0]} {S2[1]}
-                    """
-
-        elif glyph == "┳":
-            a = (random.random() * 10 + 20, random.random() * 10 + 15)
-
-            path = f"""M {W1[0]} {W1[1]}
-                    Q {a[0]} {a[1]} {E1[0]} {E1[1]}
-                    M {W2[0]} {W2[1]}
-                    C {a[0]-5} {a[1]+10} {a[0]-5} {a[1]+10} {S1[0]} {S1[1]}
-                    M {S2[0]} {S2[1]}
-                    C {a[0]+5} {a[1]+10} {a[0]+5} {a[1]+10} {E2[0]} {E2[1]}
-                    """
-        else:
-            logging.error(f"Strange glyph {glyph} when adding {direction} river to {self.name}")
-
-        road = ET.Element(
-            "{http://www.w3.org/2000/svg}path",
-            style="fill:none;stroke:#000000;stroke-width:0.264583px;stroke-linecap:butt;stroke-linejoin:miter;stroke-opacity:1",
-            d=path,
-            id=f"road{direction}",
-            transform=f"rotate({rotation*90} 25 25)",
-        )
-        self.features.append(road)
+        logging.debug("Adding %s River to %s", direction, self.name)
+        self.draw_path("river", direction)
 
     def draw_city(self, direction: str) -> None:
         """Draw a city on the card."""
-        logging.debug(f"Adding {direction} City to {self.name}")
-        NW = (0, 0)
-        NE = (0, 50)
-        SE = (50, 50)
-        SW = (50, 0)
-        glyph, rotation = self.direction[direction]
-        if glyph == "╺":
-            path = f"""M {NE[0]} {NE[1]}
-                    Q 25 25  {SE[0]} {SE[1]}"""
-        elif glyph == "┗":
-            path = f"""M {NW[0]} {NW[1]}
-                    Q 25 25  {SE[0]} {SE[1]}"""
-        elif glyph == "┃":
-            path = f"""M {NW[0]} {NW[1]}
-                    Q 25 15  {SW[0]} {SW[1]}
-                    M {NE[0]} {NE[1]}
-                    Q 25 35  {SE[0]} {SE[1]}"""
-        elif glyph == "┳":
-            path = f"""M {NW[0]} {NW[1]}
-                    Q 10 25  {NE[0]} {NE[1]}"""
-        # missing glyphs "┞┦╀╃╄╋╼"
-        else:
-            logging.error(f"Strange glyph {glyph} when adding {direction} city to {self.name}")
-            path = ""
-
-        road = ET.Element(
-            "{http://www.w3.org/2000/svg}path",
-            style="fill:none;stroke:#000000;stroke-width:0.264583px;stroke-linecap:butt;stroke-linejoin:miter;stroke-opacity:1",
-            d=path,
-            id=f"road{direction}",
-            transform=f"rotate({rotation*90} 25 25)",
-        )
-        self.features.append(road)
-
-    def draw(self) -> None:  # noqa: C901, PLR0912, PLR0915
-        """Draw all the features of the card."""
-        if self.roads:
-            for direction in self.roads.split(" "):
-                self.draw_roads(direction)
-        if self.city:
-            for direction in self.city.split(" "):
-                self.draw_city(direction)
-        if self.river:
-            for direction in self.river.split(" "):
-                self.draw_river(direction)
-
-        if self.abbey:
-            logging.debug(f"Adding Abbey to {self.name}")
-            self.features.append(get_gfx("Abbey.svg"))
-
-        if self.cathedral:
-            logging.debug(f"Adding Cathedral to {self.name}")
-            self.features.append(get_gfx("Cathedral.svg"))
-
-        if self.cloth:
-            logging.debug(f"Adding Cloth to {self.name}")
-            self.features.append(get_gfx("Cloth.svg"))
-
-        if self.dragon:
-            logging.debug(f"Adding Dragon to {self.name}")
-            self.features.append(get_gfx("Dragon.svg"))
-
-        if self.grain:
-            logging.debug(f"Adding Grain to {self.name}")
-            self.features.append(get_gfx("Grain.svg"))
-
-        if self.inn:
-            logging.debug(f"Adding Inn to {self.name}")
-            self.features.append(get_gfx("Inn.svg"))
-
-        if self.lake:
-            logging.debug(f"Adding Lake to {self.name}")
-            self.features.append(get_gfx("Lake.svg"))
-
-        if self.monastery:
-            logging.debug(f"Adding Monastery to {self.name}")
-            self.features.append(get_gfx("Monastery.svg"))
-
-        if self.pigs:
-            logging.debug(f"Adding Pigs to {self.name}")
-            self.features.append(get_gfx("Pigs.svg"))
-
-        if self.portal:
-            logging.debug(f"Adding Portal to {self.name}")
-            self.features.append(get_gfx("Portal.svg"))
-
-        if self.princess:
-            logging.debug(f"Adding Princess to {self.name}")
-            self.features.append(get_gfx("Princess.svg"))
-
-        if self.shield:
-            logging.debug(f"Adding Shield to {self.name}")
-            self.features.append(get_gfx("Shield.svg"))
-
-        if self.shrine:
-            logging.debug(f"Adding Shrine to {self.name}")
-            self.features.append(get_gfx("Shrine.svg"))
-
-        if self.spring:
-            logging.debug(f"Adding Spring to {self.name}")
-            self.features.append(get_gfx("Spring.svg"))
-
-        if self.tower:
-            logging.debug(f"Adding Tower to {self.name}")
-            self.features.append(get_gfx("Tower.svg"))
-
-        if self.vulcano:
-            logging.debug(f"Adding Vulcano to {self.name}")
-            self.features.append(get_gfx("Vulcano.svg"))
-
-        if self.wine:
-            logging.debug(f"Adding Wine to {self.name}")
-            self.features.append(get_gfx("Wine.svg"))
-
-        logging.info(f"Writing to {self.output_dir}/{self.name}.svg")
-        self.tile.write(f"{self.output_dir}/{self.name}.svg")
+        logging.debug("Adding %s City to %s", direction, self.name)
+        self.draw_path("city", direction)
+
+    def draw(self) -> None:
+        """Draw all the features of the card and write it to its file."""
+        self.render()
+        self.write()
+
+    def render(self) -> None:
+        """Draw all the features of the card, and compact it if output is compacted."""
+        roads, city, river = self.edges
+        for direction in roads:
+            self.draw_roads(direction)
+        for direction in city:
+            self.draw_city(direction)
+        for direction in river:
+            self.draw_river(direction)
+
+        for attr, filename in self.gfx.items():
+            if self.__dict__[attr]:
+                logging.debug("Adding %s to %s", filename.removesuffix(".svg"), self.name)
+                self.features.append(get_gfx(filename))
+
+        precision = compact_precision()
+        if precision is not None and compact_tree(self.tile.getroot(), precision):
+            self.features.insert(0, style_element(carried=True))
+
+    def write(self) -> None:
+        """Write the card to its file in output_dir."""
+        logging.info("Writing to %s/%s.svg", self.output_dir, self.name)
+        write_tree(f"{self.output_dir}/{self.name}.svg", self.tile)
@@ -0,0 +1,179 @@
+"""Zip and tar archives of tiles, as output of a build and input of the tiler.
+
+Writing all tiles of a run into one archive opens and closes one file instead
+of one per card. zipfile and tarfile are only imported when an archive is used.
+The kind of archive follows its suffix: .zip is deflated,
+.tar is not compressed, .tar.gz/.tgz, .tar.bz2 and .tar.xz are.
+
+>>> is_archive("tiles.tar.gz"), is_archive("tiles/CAR01-1.svg")
+(True, False)
+>>> archive_member("tiles.tar.gz")
+'tiles.svg'
+"""
+
+from __future__ import annotations
+
+import io
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple, Self
+
+from .stats import stage
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+# suffix of each kind of tar archive and its compression, for tarfile.open
+TAR_MODES = {".tar": "", ".tar.gz": "gz", ".tgz": "gz", ".tar.bz2": "bz2", ".tar.xz": "xz"}
+
+
+def _suffix(filename: str) -> str | None:
+    """Return the archive suffix of filename, or None if it is not an archive."""
+    name = filename.lower()
+    return next((suffix for suffix in (".zip", *TAR_MODES) if name.endswith(suffix)), None)
+
+
+def is_archive(filename: str) -> bool:
+    """Return True if filename is named like a zip or tar archive."""
+    return isinstance(filename, str) and _suffix(filename) is not None
+
+
+def archive_member(filename: str) -> str:
+    """Return the name of the single SVG in the archive filename, its name with .svg instead of the suffix."""
+    name = Path(filename).name
+    return name[: len(name) - len(_suffix(filename))] + ".svg"
+
+
+class ArchiveWriter:
+    """Write files into a new zip or tar archive, kept open until closed.
+
+    >>> import tempfile
+    >>> with tempfile.TemporaryDirectory() as output_dir, ArchiveWriter(f"{output_dir}/tiles.zip") as archive:
+    ...     archive.add("CAR01-1.svg", b"<svg/>")
+    """
+
+    def __init__(self, filename: str) -> None:
+        """Prepare to write the archive filename, its kind follows its suffix."""
+        self.filename = filename
+        self.suffix = _suffix(filename)
+        if self.suffix is None:
+            msg = f"{filename} is not a zip or tar archive"
+            raise ValueError(msg)
+
+    def __enter__(self) -> Self:
+        """Create the archive."""
+        if self.suffix == ".zip":
+            import zipfile
+
+            self.archive = zipfile.ZipFile(self.filename, "w", compression=zipfile.ZIP_DEFLATED)
+        else:
+            import tarfile
+
+            self.archive = tarfile.open(self.filename, f"w:{TAR_MODES[self.suffix]}")
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        """Close the archive."""
+        self.archive.close()
+
+    def add(self, name: str, data: bytes) -> None:
+        """Add the file name with content data."""
+        with stage("write") as write:
+            if self.suffix == ".zip":
+                import zipfile
+
+                self.archive.writestr(zipfile.ZipInfo(name, time.localtime()[:6]), data, zipfile.ZIP_DEFLATED)
+            else:
+                import tarfile
+
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                info.mtime = int(time.time())
+                self.archive.addfile(info, io.BytesIO(data))
+            write.size = len(data)
+
+
+class Member(NamedTuple):
+    """A file in an archive."""
+
+    archive: str
+    name: str
+
+
+class ArchiveReader:
+    """Read the SVG files of a zip or tar archive."""
+
+    def __init__(self, filename: str) -> None:
+        """Open the archive filename."""
+        self.filename = filename
+        self.zip = _suffix(filename) == ".zip"
+        if self.zip:
+            import zipfile
+
+            self.archive = zipfile.ZipFile(filename)
+        else:
+            import tarfile
+
+            self.archive = tarfile.open(filename)  # noqa: SIM115
+
+    def __enter__(self) -> Self:
+        """Return the open archive."""
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        """Close the archive."""
+        self.close()
+
+    def close(self) -> None:
+        """Close the archive."""
+        self.archive.close()
+
+    def members(self) -> list[Member]:
+        """Return the SVG files in the archive, in archive order."""
+        if self.zip:
+            names = [info.filename for info in self.archive.infolist() if not info.is_dir()]
+        else:
+            names = [info.name for info in self.archive.getmembers() if info.isfile()]
+        return [Member(self.filename, name) for name in names if name.lower().endswith(".svg")]
+
+    def read(self, name: str) -> bytes:
+        """Return the content of the file name."""
+        if self.zip:
+            return self.archive.read(name)
+        return self.archive.extractfile(name).read()
+
+
+def expand_cards(cards: Iterable[str | Member]) -> list[str | Member]:
+    """Replace every archive in cards with the SVG files in it."""
+    expanded = []
+    for card in cards:
+        if is_archive(card):
+            with ArchiveReader(card) as archive:
+                expanded.extend(archive.members())
+        else:
+            expanded.append(card)
+    return expanded
+
+
+def read_cards(cards: Iterable[str | Member]) -> Iterator[bytes]:
+    """Yield the content of each file in cards, as returned by expand_cards().
+
+    Consecutive members of the same archive are read with the archive opened once.
+    """
+    archive = None
+    try:
+        for card in cards:
+            with stage("read") as read:
+                if isinstance(card, Member):
+                    if archive is None or archive.filename != card.archive:
+                        if archive is not None:
+                            archive.close()
+                        archive = ArchiveReader(card.archive)
+                    data = archive.read(card.name)
+                else:
+                    data = Path(card).read_bytes()
+                read.size = len(data)
+            yield data
+    finally:
+        if archive is not None:
+            archive.close()
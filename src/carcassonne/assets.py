@@ -0,0 +1,84 @@
+"""Process-wide cache of parsed SVG assets.
+
+Every card is built from the tile.svg template and a handful of feature
+graphics in GFX_DIR. Parsing those files is the dominant cost of rendering a
+card, so each file is parsed once and handed out as a deep copy.
+"""
+
+from __future__ import annotations
+
+import copy
+import threading
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from pathlib import Path
+
+
+class AssetCache:
+    """A bounded LRU cache of parsed SVG files.
+
+    Entries are keyed by path and invalidated when the file's mtime changes.
+    Callers always get a copy, so the cached tree is never modified.
+    """
+
+    def __init__(self, maxsize: int = 128) -> None:
+        """Initialize an empty cache.
+
+        Args:
+            maxsize (int): The maximum number of files kept parsed.
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Path, tuple[int, ET.Element, dict[str, ET.Element | None]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _entry(self, path: str | Path) -> tuple[int, ET.Element, dict[str, ET.Element | None]]:
+        """Return the cache entry for path, parsing the file if needed."""
+        path = Path(path)
+        mtime = path.stat().st_mtime_ns
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == mtime:
+                self.hits += 1
+                self._entries.move_to_end(path)
+                return entry
+            self.misses += 1
+
+        entry = (mtime, ET.parse(path).getroot(), {})  # noqa: S314
+        with self._lock:
+            self._entries[path] = entry
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def tree(self, path: str | Path) -> ET.ElementTree:
+        """Return a private copy of the document in path."""
+        return ET.ElementTree(copy.deepcopy(self._entry(path)[1]))
+
+    def find(self, path: str | Path, element: str) -> ET.Element | None:
+        """Return a private copy of the element with id `element` in path, or None."""
+        _, root, found = self._entry(path)
+        if element not in found:
+            found[element] = root.find(f".//*[@id='{element}']")
+        rv = found[element]
+        return copy.deepcopy(rv) if rv is not None else None
+
+    def clear(self) -> None:
+        """Drop all cached files and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def add_counts(self, hits: int, misses: int) -> None:
+        """Count hits and misses of a cache in another process, like a worker drawing cards."""
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def stats(self) -> dict[str, int]:
+        """Return the hit/miss counters and the current size of the cache."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "maxsize": self.maxsize}
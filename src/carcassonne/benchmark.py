@@ -0,0 +1,198 @@
+"""Benchmarks of drawing cards, tiling sheets and generating whole sets.
+
+Every benchmark is a named case that is timed a number of times. The results
+can be saved as JSON and compared against a saved baseline, a case is a
+regression when its median time grows by more than a threshold.
+
+The startup: benchmarks run a command in a new interpreter, they should take
+less than STARTUP_TARGET seconds, carcassonne_bench startup fails otherwise.
+
+>>> results = run_benchmarks(["card:road"], repeat=3)
+>>> sorted(results["cases"]["card:road:╺"])
+['max', 'median', 'min', 'runs']
+"""
+
+from __future__ import annotations
+
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from . import Card, __version__, compact, stream_cards, tile_cards
+from .build import card_jobs, draw_cards
+from .catalog import catalog
+from .geometry import PATHS
+from .placement import random_game
+from .river import river_solver
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+
+TILE_COUNTS = (100, 1000, 10000)
+SYNTHETIC_COUNTS = (1000, 5000)
+# river decks, the sets and the cards left out, with their first layouts listed, the small ones also counted
+RIVER_DECKS = {"RIV": (("RIV",), ()), "RII": (("RII",), ()), "RIV+RII": (("RIV", "RII"), ("RIV01", "RII12"))}
+RIVER_COUNTED = ("RIV", "RII")
+RIVER_LAYOUTS = 1000
+# entrypoint commands timed from the start of a new interpreter, and the seconds they may take
+STARTUP_COMMANDS = {
+    "sets-list": ("generate_sets", "--list"),
+    "tiler-help": ("tiler", "--help"),
+    "helper": ("helper",),
+}
+STARTUP_TARGET = 0.3
+
+
+def _start(command: str, *args: str) -> Callable[[], object]:
+    """Return a benchmark that runs the entrypoint command with args in a new interpreter."""
+    code = f"import sys; from carcassonne.entrypoint import {command}; {command}(sys.argv[1:])"
+    return lambda: subprocess.run(  # noqa: S603
+        [sys.executable, "-c", code, *args], check=True, stdout=subprocess.DEVNULL
+    )
+
+
+def _render(args: dict) -> Callable[[], object]:
+    """Return a benchmark that renders and serializes one card with args."""
+    return lambda: ET.tostring(_card(args).getroot())
+
+
+def _card(args: dict) -> ET.ElementTree:
+    """Render one card with args and return its tree."""
+    card = Card("bench", **args)
+    card.render()
+    return card.tile
+
+
+def _river_cases() -> Iterator[tuple[str, Callable[[], object]]]:
+    """Yield the benchmarks of the river solver, each with a new solver."""
+    for name in RIVER_COUNTED:
+        sets, without = RIVER_DECKS[name]
+        yield f"river-count:{name}", lambda sets=sets, without=without: river_solver(sets, without).courses()
+    for name, (sets, without) in RIVER_DECKS.items():
+        yield (
+            f"river-layouts:{name}",
+            lambda sets=sets, without=without: sum(1 for _ in river_solver(sets, without).layouts(RIVER_LAYOUTS)),
+        )
+
+
+def _cases(workdir: Path) -> Iterator[tuple[str, Callable[[], object]]]:
+    """Yield the name and function of every benchmark, files are written in workdir."""
+    attr = {"road": "roads", "river": "river", "city": "city"}
+    for kind, templates in PATHS.items():
+        for glyph in templates:
+            direction = next(d for d, (g, _) in Card.direction.items() if g == glyph)
+            yield f"card:{kind}:{glyph}", _render({attr[kind]: direction})
+
+    for feature in Card.gfx:
+        yield f"feature:{feature}", _render({feature: True})
+
+    for name, (command, *args) in STARTUP_COMMANDS.items():
+        yield f"startup:{name}", _start(command, *args)
+
+    for cardset in ("CAR", "TRB"):
+        deck = [spec.key for spec in catalog().sets[cardset] for _ in range(spec.count)]
+        random.Random(0).shuffle(deck)
+        yield f"placement:{cardset}", lambda deck=deck: random_game(deck, random.Random(0))
+
+    yield from _river_cases()
+
+    for cardset in catalog().sets:
+        jobs = card_jobs([cardset])
+        output_dir = workdir / cardset
+        output_dir.mkdir()
+        yield f"set:{cardset}", lambda jobs=jobs, output_dir=output_dir: draw_cards(jobs, str(output_dir), force=True)
+
+    tiles = workdir / "tiles"
+    tiles.mkdir()
+    draw_cards(card_jobs(catalog().sets), str(tiles))
+    pool = sorted(str(tile) for tile in tiles.glob("*.svg"))
+    for count in TILE_COUNTS:
+        cards = [pool[n % len(pool)] for n in range(count)]
+        sheet = str(workdir / "sheet.svg")
+        yield f"tile:{count}", lambda cards=cards, sheet=sheet: tile_cards(sheet, cards, 10)
+        yield f"stream:{count}", lambda cards=cards, sheet=sheet: stream_cards(sheet, cards, 10)
+
+    specs = list(catalog())
+    rng = random.Random(0)
+    for count in SYNTHETIC_COUNTS:
+        jobs = [(f"SYN{n:05}-1", 1, rng.choice(specs)) for n in range(count)]
+        sheet = str(workdir / "synthetic.svg")
+        yield f"synthetic:{count}", lambda jobs=jobs, sheet=sheet: draw_cards(jobs, None, sheet=sheet)
+        yield f"compact:{count}", lambda jobs=jobs, sheet=sheet: _compacted(draw_cards, jobs, None, sheet=sheet)
+
+
+def _compacted(function: Callable, *args: object, **kwargs: object) -> object:
+    """Call function with compact output enabled."""
+    compact.enable()
+    try:
+        return function(*args, **kwargs)
+    finally:
+        compact.disable()
+
+
+def run_benchmarks(selection: list[str] | None = None, repeat: int = 5) -> dict:
+    """Time the benchmarks whose names start with one of selection, or all.
+
+    Args:
+        selection (list): Prefixes of the names of the benchmarks to run.
+        repeat (int): How many times to time each benchmark.
+
+    Returns:
+        dict: The environment and, for each benchmark, the min, median and max time in seconds.
+    """
+    results = {
+        "version": __version__,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "repeat": repeat,
+        "cases": {},
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, bench in _cases(Path(workdir)):
+            if selection and not any(name.startswith(prefix) for prefix in selection):
+                continue
+            times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                bench()
+                times.append(time.perf_counter() - start)
+            results["cases"][name] = {
+                "min": min(times),
+                "median": statistics.median(times),
+                "max": max(times),
+                "runs": repeat,
+            }
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float = 0.1) -> dict[str, float]:
+    """Return the benchmarks whose median is more than threshold slower than in baseline, with their ratio."""
+    regressions = {}
+    for name, result in results["cases"].items():
+        base = baseline["cases"].get(name)
+        if base is None or base["median"] <= 0:
+            continue
+        ratio = result["median"] / base["median"]
+        if ratio > 1 + threshold:
+            regressions[name] = ratio
+    return regressions
+
+
+def save_results(filename: str, results: dict) -> None:
+    """Save results as JSON in filename."""
+    with Path(filename).open("w") as f:
+        json.dump(results, f, indent=1, ensure_ascii=False)
+
+
+def load_results(filename: str) -> dict:
+    """Load results saved by save_results()."""
+    with Path(filename).open() as f:
+        return json.load(f)
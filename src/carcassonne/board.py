@@ -0,0 +1,236 @@
+"""Rendering of a played board: many placed and rotated cards of the catalog.
+
+A board is a list of placements, a card of the catalog at a cell (x, y), x to
+the east and y to the south, in a rotation of quarter turns clockwise, like the
+boards of placement.py. Cells are 50 mm, so neighbouring cards touch.
+
+Every distinct card, by key and copy, is drawn once and defined as a <symbol>.
+The feature graphics in it are <use> of symbols too, shared by all cards, like
+on a sheet with symbols. A placement is then a single <use> with a transform,
+so a board of thousands of cards stays small. Only the cards in the viewport
+of a document, and the symbols they use, are written in it.
+
+A board can also be cut into map tiles: fixed-size square documents at a
+number of zoom levels, laid out like the tiles of a web map, z/x/y.svg, so a
+browser only loads the part of a huge board it shows.
+
+>>> renderer = BoardRenderer([Placement("CAR14", 0, 0), Placement("CAR14", 1, 0, 1), Placement("TOW01", 5, 5)])
+>>> renderer.bounds()
+Viewport(x=0, y=0, width=6, height=6)
+>>> [placement.key for placement in renderer.within(Viewport(0, 0, 2, 1))]
+['CAR14', 'CAR14']
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple
+
+from . import SVG_NS, Card, compact_card, compact_sheet, get_element, get_template, use_symbols, write_tree
+from .catalog import catalog
+from .compact import precision as compact_precision
+from .stats import stage
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+    from .placement import Board
+
+XLINK_HREF = "{http://www.w3.org/1999/xlink}href"
+CELL = 50
+
+
+class Placement(NamedTuple):
+    """A card of the catalog on a cell of a board."""
+
+    key: str
+    x: int
+    y: int
+    rotation: int = 0  # quarter turns clockwise
+    copy: int = 1
+
+
+class Viewport(NamedTuple):
+    """A rectangle of cells of a board."""
+
+    x: int
+    y: int
+    width: int
+    height: int
+
+    @classmethod
+    def parse(cls, text: str) -> Viewport:
+        """Return the viewport X,Y,WIDTH,HEIGHT in cells.
+
+        Raises:
+            ValueError: If text is not four integers or the viewport is empty.
+        """
+        try:
+            viewport = cls(*(int(number) for number in text.split(",")))
+        except (TypeError, ValueError) as e:
+            msg = f"Viewport {text} is not X,Y,WIDTH,HEIGHT"
+            raise ValueError(msg) from e
+        if viewport.width < 1 or viewport.height < 1:
+            msg = f"Viewport {text} is empty"
+            raise ValueError(msg)
+        return viewport
+
+    def contains(self, placement: Placement) -> bool:
+        """Return True if placement is inside the viewport."""
+        return self.x <= placement.x < self.x + self.width and self.y <= placement.y < self.y + self.height
+
+
+def load_placements(filename: str) -> list[Placement]:
+    """Read placements from the JSON file filename.
+
+    The file is a list of placements, each an object with card, x, y and optionally rotation
+    and copy, or a list [card, x, y, rotation, copy] where rotation and copy may be left out.
+
+    Raises:
+        ValueError: If a placement is malformed or its card is not in the catalog.
+    """
+    with Path(filename).open() as f:
+        entries = json.load(f)
+    cards = catalog()
+    placements = []
+    for n, entry in enumerate(entries):
+        try:
+            if isinstance(entry, dict):
+                placement = Placement(
+                    entry["card"], entry["x"], entry["y"], entry.get("rotation", 0), entry.get("copy", 1)
+                )
+            else:
+                placement = Placement(*entry)
+            cards[placement.key]
+        except (KeyError, TypeError) as e:
+            msg = f"Placement {n + 1} in {filename} is not valid: {entry!r}"
+            raise ValueError(msg) from e
+        placements.append(placement._replace(rotation=int(placement.rotation) % 4))
+    return placements
+
+
+def board_placements(board: Board) -> list[Placement]:
+    """Return the cards on a board of placement.py as placements."""
+    return [Placement(placed.key, x, y, placed.rotation) for (x, y), placed in board.tiles.items()]
+
+
+class BoardRenderer:
+    """Render documents of any part of a board, drawing every distinct card once."""
+
+    def __init__(self, placements: Iterable[Placement], seed: str = "") -> None:
+        """Prepare to render placements, a later placement on the same cell replaces an earlier one."""
+        self.cells = {(placement.x, placement.y): placement for placement in placements}
+        self.seed = seed
+        self.precision = compact_precision()
+        self.cards: dict[tuple[str, int], tuple[ET.Element, list[str]]] = {}
+        self.gfx: dict[str, ET.Element] = {}
+
+    def __len__(self) -> int:
+        """Return the number of placed cards."""
+        return len(self.cells)
+
+    def bounds(self) -> Viewport:
+        """Return the smallest viewport holding every card."""
+        if not self.cells:
+            return Viewport(0, 0, 1, 1)
+        xs = [x for x, _ in self.cells]
+        ys = [y for _, y in self.cells]
+        return Viewport(min(xs), min(ys), max(xs) - min(xs) + 1, max(ys) - min(ys) + 1)
+
+    def within(self, viewport: Viewport) -> Iterator[Placement]:
+        """Yield the placements in viewport, row by row."""
+        if viewport.width * viewport.height > len(self.cells):
+            yield from sorted((p for p in self.cells.values() if viewport.contains(p)), key=lambda p: (p.y, p.x))
+            return
+        for y in range(viewport.y, viewport.y + viewport.height):
+            for x in range(viewport.x, viewport.x + viewport.width):
+                if (x, y) in self.cells:
+                    yield self.cells[x, y]
+
+    def symbol(self, key: str, copy: int) -> tuple[ET.Element, list[str]]:
+        """Return the symbol of a card and the names of the feature symbols it uses, drawn on first use."""
+        if (key, copy) not in self.cards:
+            with stage("card"):
+                card = Card.from_spec(f"{key}-{copy}", catalog()[key], copy=copy, seed=self.seed)
+                card.render()
+            element = card.features
+            del element.attrib["id"]
+            compact_card(element, self.precision)
+            use_symbols(element, self.gfx)
+            uses = {use.get("href")[1:] for use in element.iter(f"{{{SVG_NS}}}use")}
+            symbol = ET.Element(f"{{{SVG_NS}}}symbol", id=f"card-{key}-{copy}", overflow="visible")
+            symbol.append(element)
+            self.cards[key, copy] = (symbol, sorted(uses))
+        return self.cards[key, copy]
+
+    def document(self, viewport: Viewport | None = None, size: str | None = None) -> ET.ElementTree:
+        """Return a document of the cards in viewport (default the whole board).
+
+        Args:
+            viewport (Viewport): The cells to show.
+            size (str): The width and height of the document, like 256, default 50mm per cell.
+        """
+        viewport = viewport or self.bounds()
+        tree = get_template()
+        compact_sheet(tree, self.precision)
+        root = tree.getroot()
+        root.attrib["width"] = size or f"{viewport.width * CELL}mm"
+        root.attrib["height"] = size or f"{viewport.height * CELL}mm"
+        root.attrib["viewBox"] = (
+            f"{viewport.x * CELL} {viewport.y * CELL} {viewport.width * CELL} {viewport.height * CELL}"
+        )
+        tile = get_element(tree, "tile")
+        symbols = {}
+        for placement in self.within(viewport):
+            symbol, uses = self.symbol(placement.key, placement.copy)
+            name = symbol.get("id")
+            symbols[name] = symbol
+            symbols.update((gfx, self.gfx[gfx]) for gfx in uses)
+            transform = f"translate({placement.x * CELL} {placement.y * CELL})"
+            if placement.rotation:
+                transform += f" rotate({placement.rotation * 90} {CELL / 2:g} {CELL / 2:g})"
+            tile.append(
+                ET.Element(f"{{{SVG_NS}}}use", {"href": f"#{name}", XLINK_HREF: f"#{name}", "transform": transform})
+            )
+        root.find(f"{{{SVG_NS}}}defs").extend(symbols[name] for name in sorted(symbols))
+        return tree
+
+    def write(self, filename: str, viewport: Viewport | None = None) -> None:
+        """Write a document of the cards in viewport (default the whole board) to filename."""
+        write_tree(filename, self.document(viewport))
+
+    def export_tiles(self, output_dir: str, cards_per_tile: int = 4, zooms: int = 3, size: int = 256) -> int:
+        """Write the board as map tiles, output_dir/z/x/y.svg, and output_dir/map.json describing them.
+
+        At the highest zoom, zooms - 1, a map tile shows cards_per_tile by cards_per_tile cells,
+        every zoom level below shows twice as many in each direction. Map tiles without cards
+        are not written, x and y count from the top left corner of the board.
+
+        Returns:
+            int: The number of map tiles written.
+        """
+        bounds = self.bounds()
+        written = 0
+        for zoom in range(zooms):
+            span = cards_per_tile << (zooms - 1 - zoom)
+            for column in range(math.ceil(bounds.width / span)):
+                for row in range(math.ceil(bounds.height / span)):
+                    viewport = Viewport(bounds.x + column * span, bounds.y + row * span, span, span)
+                    if next(self.within(viewport), None) is None:
+                        continue
+                    path = Path(output_dir) / str(zoom) / str(column) / f"{row}.svg"
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    write_tree(str(path), self.document(viewport, str(size)))
+                    written += 1
+        layout = {
+            "origin": [bounds.x, bounds.y],
+            "cells": [bounds.width, bounds.height],
+            "zooms": zooms,
+            "cards_per_tile": cards_per_tile,
+            "tile_size": size,
+        }
+        (Path(output_dir) / "map.json").write_text(json.dumps(layout, indent=1) + "\n")
+        return written
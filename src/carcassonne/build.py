@@ -0,0 +1,459 @@
+"""Rendering of whole card sets.
+
+The cards of a build are described as jobs, (name, copy, CardSpec) tuples,
+that can be drawn one after another or spread over a pool of worker processes.
+Every worker keeps its own warm asset cache for the whole run, its hits and
+misses are counted in the asset cache of the main process.
+
+The cards can also be placed straight onto a sheet, like the one made by
+tile_cards(), without writing and re-reading a file per card, and written into
+one zip or tar archive instead of a file per card.
+
+Next to the tiles a manifest records a digest of everything a tile was drawn
+from: the card arguments, copy, seed, compact precision, graphics files and
+code. Cards whose digest is unchanged are not drawn again.
+
+The drawn cards are written by background threads while the next cards are
+drawn, through a bounded queue, see writer.py.
+
+With uniform copies every copy of a card is drawn like the first, so only the
+first is drawn and the others are copies of it. With dedupe, tiles are stored by
+content: a tile identical to one already written in the build is a hard link or
+symbolic link to it, or only an entry in the links of the manifest.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import json
+import logging
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple
+
+from . import (
+    GFX_DIR,
+    Card,
+    SheetWriter,
+    __version__,
+    asset_cache,
+    compact,
+    place_card,
+    sheet_position,
+    stats,
+    use_symbols,
+    warm_worker,
+)
+from .archive import ArchiveWriter
+from .catalog import FEATURE_BITS, CardSpec, catalog
+from .query import index
+from .writer import BackgroundWriter, TileSink
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+logger = logging.getLogger()
+
+MANIFEST = "manifest.json"
+DEDUPE = ("hardlink", "symlink", "manifest")
+
+_file_digests: dict[Path, tuple[int, str]] = {}
+
+
+def card_jobs(sets: Iterable[str] | None = None, query: str = "") -> list[tuple[str, int, CardSpec]]:
+    """Return the jobs for every physical card in sets (default all), optionally only cards matching query.
+
+    Raises:
+        QueryError: If query is not valid, see query.py.
+    """
+    specs = catalog().select(sets=sets)
+    if query:
+        keys = set(index().query(query))
+        specs = [spec for spec in specs if spec.key in keys]
+    return [(f"{spec.key}-{i + 1}", i + 1, spec) for spec in specs for i in range(spec.count)]
+
+
+def card_assets(spec: CardSpec) -> list[str]:
+    """Return the files in GFX_DIR a card is drawn from."""
+    return ["tile.svg"] + [filename for attr, filename in Card.gfx.items() if spec.features & FEATURE_BITS[attr]]
+
+
+def file_digest(path: Path) -> str:
+    """Return the sha256 of the content of path, cached until its mtime changes."""
+    mtime = path.stat().st_mtime_ns
+    cached = _file_digests.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, hashlib.sha256(path.read_bytes()).hexdigest())
+        _file_digests[path] = cached
+    return cached[1]
+
+
+def code_version() -> str:
+    """Return a digest of the code that draws the cards."""
+    code = hashlib.sha256()
+    for module in ("__init__.py", "geometry.py", "compact.py"):
+        code.update(file_digest(Path(__file__).parent / module).encode())
+    return f"{__version__}-{code.hexdigest()[:16]}"
+
+
+def card_digest(copy: int, spec: CardSpec, seed: str = "") -> str:
+    """Return a digest of all the inputs to drawing a card."""
+    inputs = {
+        "spec": dict(spec.args),
+        "copy": copy,
+        "seed": seed,
+        "compact": compact.precision(),
+        "assets": {filename: file_digest(GFX_DIR / filename) for filename in card_assets(spec)},
+        "code": code_version(),
+    }
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+
+def load_manifest(output_dir: str, section: str = "cards") -> dict[str, str]:
+    """Return a section of the manifest of the last build in output_dir, or {} if there is none.
+
+    The sections are cards, the digest of every card, and links, the tile every tile deduplicated
+    as a symlink or only in the manifest refers to.
+    """
+    try:
+        with (Path(output_dir) / MANIFEST).open() as f:
+            return json.load(f).get(section, {})
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+
+def save_manifest(output_dir: str, cards: dict[str, str], links: dict[str, str] | None = None) -> None:
+    """Atomically replace the manifest in output_dir."""
+    path = Path(output_dir) / MANIFEST
+    tmp = path.with_suffix(".tmp")
+    manifest = {"code": code_version(), "cards": cards}
+    if links:
+        manifest["links"] = links
+    with tmp.open("w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    tmp.replace(path)
+
+
+class Drawn(NamedTuple):
+    """The result of drawing one card."""
+
+    error: str | None = None
+    data: bytes | None = None
+    placed: str | None = None
+    symbols: dict[str, str] | None = None
+    stats: dict | None = None
+    cache: tuple[int, int] = (0, 0)  # hits and misses of the asset cache while drawing
+
+
+def draw_card(  # noqa: PLR0913
+    name: str,
+    copy: int,
+    spec: CardSpec,
+    output_dir: str | None,
+    seed: str = "",
+    place: tuple[int, int] | None = None,
+    *,
+    symbols: bool = False,
+    serialize: bool = False,
+) -> Drawn:
+    """Draw one card.
+
+    Args:
+        name (str): The name of the card.
+        copy (int): Which copy of the card this is.
+        spec (CardSpec): The compiled card.
+        output_dir (str): The directory to write the card in, None to not write it.
+        seed (str): Global seed for all cards.
+        place (tuple): (position, cards per row) to place the card at on a sheet, or None.
+        symbols (bool): Replace the feature graphics of the placed card with <use> of symbols.
+        serialize (bool): Return the card as it would be written to its file, to write it elsewhere.
+
+    Returns:
+        Drawn: The error if drawing failed, else the serialized card, the placed and serialized card
+            and its symbols, the statistics of drawing it if they are enabled, and the asset cache
+            hits and misses.
+    """
+    before = asset_cache.stats()
+    with stats.collect() as collected, stats.stage("card"):
+        drawn = _draw_card(name, copy, spec, output_dir, seed, place, symbols=symbols, serialize=serialize)
+    after = asset_cache.stats()
+    return drawn._replace(
+        stats=collected or None, cache=(after["hits"] - before["hits"], after["misses"] - before["misses"])
+    )
+
+
+def _draw_card(  # noqa: PLR0913
+    name: str,
+    copy: int,
+    spec: CardSpec,
+    output_dir: str | None,
+    seed: str,
+    place: tuple[int, int] | None,
+    *,
+    symbols: bool,
+    serialize: bool,
+) -> Drawn:
+    """Draw one card, see draw_card()."""
+    try:
+        card = Card.from_spec(name, spec, output_dir=output_dir or "", copy=copy, seed=seed)
+        card.render()
+        if output_dir is not None:
+            card.write()
+        data = None
+        if serialize:
+            with stats.stage("serialize") as serialized:
+                data = compact.tostring(card.tile.getroot())
+                serialized.size = len(data)
+        if place is None:
+            return Drawn(data=data)
+        defs = {}
+        if compact.precision() is not None:
+            compact.drop_styles(card.features)
+        if symbols:
+            use_symbols(card.features, defs)
+        with stats.stage("serialize") as serialized:
+            placed = compact.tostring(place_card(card.features, *place), encoding="unicode")
+            serialized.size = len(placed)
+        return Drawn(
+            data=data,
+            placed=placed,
+            symbols={name: ET.tostring(symbol, encoding="unicode") for name, symbol in defs.items()},
+        )
+    except Exception as e:  # noqa: BLE001
+        return Drawn(error=f"{e.__class__.__name__}: {e}")
+
+
+def _draw_job(job: tuple) -> Drawn:
+    """Unpack a job for ProcessPoolExecutor.map."""
+    *args, symbols, serialize = job
+    return draw_card(*args, symbols=symbols, serialize=serialize)
+
+
+def _draw_all(work: list[tuple], n_jobs: int) -> Iterator[Drawn]:
+    """Yield the results of drawing the cards in work, in order."""
+    if n_jobs <= 1:
+        yield from map(_draw_job, work)
+        return
+    chunksize = max(1, len(work) // (n_jobs * 4))
+    memory = stats.memory() if stats.enabled() else None
+    with ProcessPoolExecutor(
+        max_workers=n_jobs, initializer=warm_worker, initargs=(memory, compact.precision())
+    ) as executor:
+        yield from executor.map(_draw_job, work, chunksize=chunksize)
+
+
+def _changed(
+    jobs: list[tuple[str, int, CardSpec]], output_dir: str | None, seed: str, *, force: bool, uniform: bool
+) -> tuple[dict[str, str], dict[str, str], dict[str, str], dict[str, bool]]:
+    """Return the manifest and links of output_dir, the digest of each card and if the card must be written."""
+    if output_dir is None:
+        return {}, {}, {}, {}
+    manifest = load_manifest(output_dir)
+    links = load_manifest(output_dir, "links")
+    digests = {name: card_digest(1 if uniform else copy, spec, seed) for name, copy, spec in jobs}
+    write = {
+        name: force
+        or manifest.get(name) != digests[name]
+        or not (Path(output_dir) / f"{links.get(name, name)}.svg").exists()
+        for name, _, _ in jobs
+    }
+    # a tile referring to a tile drawn again must refer to its new content
+    for name, original in links.items():
+        if write.get(original) and name in write:
+            write[name] = True
+    logging.info(f"Writing {sum(write.values())} of {len(jobs)} cards")
+    return manifest, links, digests, write
+
+
+def _representatives(jobs: list[tuple[str, int, CardSpec]], *, uniform: bool) -> dict[str, str]:
+    """Return the name of the job drawn for each job, with uniform copies the first job of the same card."""
+    if not uniform:
+        return {name: name for name, _, _ in jobs}
+    first = {}
+    return {name: first.setdefault(spec.key, name) for name, _, spec in jobs}
+
+
+def _store(writer: BackgroundWriter, name: str, data: bytes, stored: dict[bytes, str] | None) -> str:
+    """Queue the tile name to be written, unless with dedupe an identical tile was stored before.
+
+    Args:
+        writer (BackgroundWriter): The writer of the tiles.
+        name (str): The name of the tile.
+        data (bytes): The content of the tile.
+        stored (dict): The name of the tile stored with each content digest, updated, None to not dedupe.
+
+    Returns:
+        str: The name of the tile name is identical to, name itself if it is written.
+    """
+    original = name if stored is None else stored.setdefault(hashlib.sha256(data).digest(), name)
+    if original == name:
+        writer.put(name, data)
+    return original
+
+
+def _updated(
+    manifest: dict[str, str], digests: dict[str, str], write: dict[str, bool], failed: dict[str, str]
+) -> dict[str, str]:
+    """Return manifest with the digests of the cards written, without the cards that failed to be written."""
+    for name, written in write.items():
+        if written and name in failed:
+            manifest.pop(name, None)
+        elif written:
+            manifest[name] = digests[name]
+    return manifest
+
+
+def _link_all(  # noqa: PLR0913
+    output_dir: str,
+    write: dict[str, bool],
+    originals: dict[str, str],
+    dedupe: str | None,
+    links: dict[str, str],
+    failed: dict[str, str],
+) -> None:
+    """Link every tile stored as an identical tile to it, a tile whose original failed fails too.
+
+    Every tile drawn again loses its link in the manifest, whether it was written itself or linked again.
+    """
+    for name, written in write.items():
+        if written:
+            links.pop(name, None)
+    for name, original in originals.items():
+        if original in failed:
+            failed[name] = failed[original]
+        elif original != name:
+            _link(output_dir, name, original, dedupe, links)
+
+
+@contextlib.contextmanager
+def _archive_writer(archive: str, writers: int) -> Iterator[BackgroundWriter]:
+    """Yield a writer of cards into the archive, with one thread as an archive is written by one thread at a time."""
+    with (
+        ArchiveWriter(archive) as archive_file,
+        BackgroundWriter(lambda name, data: archive_file.add(f"{name}.svg", data), min(writers, 1)) as writer,
+    ):
+        yield writer
+
+
+def _link(output_dir: str, name: str, original: str, dedupe: str, links: dict[str, str]) -> None:
+    """Make the tile name a link to the identical tile original, once that is written."""
+    path = Path(output_dir) / f"{name}.svg"
+    path.unlink(missing_ok=True)
+    if dedupe == "hardlink":
+        path.hardlink_to(path.with_name(f"{original}.svg"))
+        return
+    if dedupe == "symlink":
+        path.symlink_to(f"{original}.svg")
+    links[name] = original
+
+
+def draw_cards(  # noqa: PLR0913
+    jobs: list[tuple[str, int, CardSpec]],
+    output_dir: str | None,
+    n_jobs: int = 1,
+    seed: str = "",
+    *,
+    force: bool = False,
+    sheet: str | None = None,
+    per_row: int = 5,
+    symbols: bool = False,
+    archive: str | None = None,
+    uniform: bool = False,
+    dedupe: str | None = None,
+    writers: int = 1,
+) -> dict[str, str]:
+    """Draw all the cards in jobs that changed since the last build, using n_jobs worker processes.
+
+    Args:
+        jobs (list): (name, copy, CardSpec) tuples as returned by card_jobs().
+        output_dir (str): The directory where the cards' SVG files will be saved, None to not save them.
+        n_jobs (int): The number of processes to draw in, 1 draws in this process.
+        seed (str): Global seed for all cards.
+        force (bool): Draw all cards, even the unchanged.
+        sheet (str): Also place all the cards, changed or not, on this sheet.
+        per_row (int): Number of cards on each row of the sheet.
+        symbols (bool): Define each feature graphic once on the sheet and <use> it in the cards.
+        archive (str): Write all the cards into this zip or tar archive, usually with output_dir None.
+        uniform (bool): Draw every copy of a card like the first, and only draw the first.
+        dedupe (str): Store identical tiles once, the others are a hardlink, symlink or only in the manifest.
+        writers (int): The number of threads writing the tiles while the next are drawn, 0 writes them while
+            drawing, in the worker processes.
+
+    Returns:
+        dict: The cards that failed, from name to a description of the error.
+    """
+    manifest, links, digests, write = _changed(jobs, output_dir, seed, force=force, uniform=uniform)
+    todo = jobs if sheet or archive else [job for job in jobs if write[job[0]]]
+    drawn_as = _representatives(todo, uniform=uniform)
+    # tiles are written here from the content drawn, by the writer threads
+    store = output_dir is not None and (writers > 0 or uniform or dedupe is not None)
+    work = [
+        (
+            name,
+            1 if uniform else copy,
+            spec,
+            output_dir if write.get(name) and not store else None,
+            seed,
+            (n, per_row) if sheet else None,
+            symbols,
+            archive is not None or store,
+        )
+        for n, (name, copy, spec) in enumerate(todo)
+        if drawn_as[name] == name
+    ]
+
+    failed = {}
+    stored = {} if dedupe else None
+    originals = {}
+    representatives = {}
+    results = _draw_all(work, n_jobs)
+    with contextlib.ExitStack() as stack:
+        sheet_writer = stack.enter_context(SheetWriter(sheet, len(todo), per_row, symbols=symbols)) if sheet else None
+        tile_writer = stack.enter_context(BackgroundWriter(TileSink(output_dir), writers)) if store else None
+        archive_writer = stack.enter_context(_archive_writer(archive, writers)) if archive else None
+        for n, (name, _, _) in enumerate(todo):
+            if drawn_as[name] == name:
+                drawn = representatives[name] = next(results)
+                stats.merge(drawn.stats, stats.set_of(name))
+                if n_jobs > 1:
+                    # the workers have their own asset caches, their lookups are counted in this one
+                    asset_cache.add_counts(*drawn.cache)
+            else:
+                drawn = _copy_of(representatives[drawn_as[name]], n, per_row)
+            if drawn.error is not None:
+                logging.error(f"Failed to draw {name}: {drawn.error}")
+                failed[name] = drawn.error
+            elif store and write.get(name):
+                originals[name] = _store(tile_writer, name, drawn.data, stored)
+            _add(name, drawn, archive_writer, sheet_writer)
+    for writer in (tile_writer, archive_writer):
+        failed |= writer.failed if writer is not None else {}
+    _link_all(output_dir, write, originals, dedupe, links, failed)
+
+    if any(write[name] and name not in failed for name in write):
+        save_manifest(output_dir, _updated(manifest, digests, write, failed), links)
+    if stored:
+        logging.info(f"Stored {len(stored)} distinct tiles for {sum(write.values())} cards")
+    return failed
+
+
+def _add(name: str, drawn: Drawn, archive: BackgroundWriter | None, sheet: SheetWriter | None) -> None:
+    """Add the card drawn to the archive and the sheet being written, if any."""
+    if archive is not None and drawn.data is not None:
+        archive.put(name, drawn.data)
+    if sheet is not None:
+        if drawn.placed is None:
+            sheet.skip()
+        else:
+            sheet.write(drawn.placed, drawn.symbols)
+
+
+def _copy_of(drawn: Drawn, n: int, per_row: int) -> Drawn:
+    """Return drawn as drawn again for a copy, placed at position n on the sheet."""
+    if drawn.placed is None:
+        return drawn._replace(stats=None)
+    group = ET.fromstring(drawn.placed)  # noqa: S314
+    group.set("transform", sheet_position(n, per_row))
+    return drawn._replace(placed=compact.tostring(group, encoding="unicode"), symbols=None, stats=None)
@@ -0,0 +1,366 @@
+"""Compiled, immutable form of the card sets.
+
+card_sets in sets.py is easy to write, but every Card built from it has to
+check its arguments and split its edge strings. compile_catalog() does that
+once: every card becomes a CardSpec whose features are a bitmask and whose
+road, city and river edges are validated tuples of directions. Card.from_spec()
+builds a card from a CardSpec without any checks.
+
+The compiled catalog is cached on disk, in CACHE_DIR, so most runs do not even
+import sets.py. A cached catalog is keyed on the content of the files it was
+compiled from, and is compiled again when any of them changes.
+
+More sets can be added from catalog files, TOML or JSON, listed in the
+CARCASSONNE_CATALOGS environment variable (separated like PATH) or added with
+add_catalogs(). Every set is a table with a name and cards, each card a number
+with the same [count, {arguments}] as in sets.py, where shield may also be a
+number of shields:
+
+    [HRS]
+    name = "House rules"
+    [HRS.cards]
+    1 = [2, {city = "N", roads = "EW", shield = true}]
+    2 = [1, {monastery = true, roads = "S"}]
+    3 = [1, {city = "ENSW", shield = 2}]
+
+The cards are validated against the attributes of Card and compiled like the
+built-in sets, and every catalog file is cached on its own. In a cache, equal
+tuples, like the attributes most cards share, are stored once, so even a
+catalog of thousands of cards is read in a few milliseconds.
+
+>>> cards = catalog()
+>>> cards["CAR14"].count, cards["CAR14"].city
+(5, ('N',))
+>>> cards.count(feature_mask("shield", "city"), sets=["CAR"])
+10
+"""
+
+from __future__ import annotations
+
+import functools
+import hashlib
+import itertools
+import json
+import logging
+import marshal
+import os
+import re
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple
+
+from . import Card
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator
+
+FEATURES = tuple(Card.gfx)
+FEATURE_BITS = {feature: 1 << n for n, feature in enumerate(FEATURES)}
+EDGES = ("roads", "city", "river")
+SETS_FILE = Path(__file__).parent / "sets.py"
+# the code a catalog is compiled with, a cached catalog is compiled again when it changes
+COMPILER = (Path(__file__), Path(__file__).parent / "__init__.py")
+CACHE_DIR = Path(
+    os.environ.get("CARCASSONNE_CACHE")
+    or Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "carcassonne"
+)
+
+USER_CATALOGS = [Path(path) for path in os.environ.get("CARCASSONNE_CATALOGS", "").split(os.pathsep) if path]
+
+
+class CatalogError(ValueError):
+    """A catalog file is malformed, or a card in it is not a valid Card."""
+
+
+def feature_mask(*features: str) -> int:
+    """Return the bitmask of features, roads, city and river are not features but edges."""
+    return functools.reduce(int.__or__, (FEATURE_BITS[feature] for feature in features if feature in FEATURE_BITS), 0)
+
+
+class CardSpec(NamedTuple):
+    """One card of a set, compiled."""
+
+    key: str  # set and number, like CAR14
+    set: str
+    number: int
+    count: int
+    features: int  # bitmask of FEATURE_BITS
+    roads: tuple[str, ...]
+    city: tuple[str, ...]
+    river: tuple[str, ...]
+    args: tuple[tuple[str, object], ...]  # the arguments the card was defined with
+    attributes: tuple[tuple[str, object], ...]  # all attributes of a Card with those arguments
+
+    def has(self, mask: int) -> bool:
+        """Return True if the card has all the features in mask."""
+        return self.features & mask == mask
+
+
+def compile_spec(cardset: str, number: int, count: int, args: dict) -> CardSpec:
+    """Validate the arguments of a card and compile them.
+
+    Raises:
+        AttributeError: If a Card have no attribute in args.
+        ValueError: If an edge is not a known direction.
+    """
+    attributes = {edge: "" for edge in EDGES} | dict.fromkeys(FEATURES, False)
+    seed = ""
+    for attr, value in args.items():
+        if attr not in attributes:
+            msg = f"{cardset}{number:02}: Card have no attribute {attr}"
+            raise AttributeError(msg)
+        attributes[attr] = value
+        seed += str(attr) + str(value)
+    attributes["seed"] = seed
+
+    edges = {}
+    for edge in EDGES:
+        edges[edge] = tuple(attributes[edge].split())
+        for direction in edges[edge]:
+            if direction not in Card.direction:
+                msg = f"{cardset}{number:02}: Unknown direction {direction} in {edge}"
+                raise ValueError(msg)
+
+    return CardSpec(
+        key=f"{cardset}{number:02}",
+        set=cardset,
+        number=number,
+        count=count,
+        features=feature_mask(*(feature for feature in FEATURES if attributes[feature])),
+        args=tuple(args.items()),
+        attributes=tuple(attributes.items()),
+        **edges,
+    )
+
+
+class Catalog:
+    """An immutable collection of compiled cards, by key and by set."""
+
+    __slots__ = ("_cards", "names", "sets")
+
+    def __init__(self, specs: Iterable[CardSpec], names: dict[str, str]) -> None:
+        """Collect specs, names is the human readable name of each set."""
+        self._cards = {spec.key: spec for spec in specs}
+        sets = {}
+        for spec in self._cards.values():
+            sets.setdefault(spec.set, []).append(spec)
+        self.sets = {cardset: tuple(specs) for cardset, specs in sets.items()}
+        self.names = dict(names)
+
+    def __getitem__(self, key: str) -> CardSpec:
+        """Return the card with key, like CAR14."""
+        return self._cards[key]
+
+    def __iter__(self) -> Iterator[CardSpec]:
+        """Iterate over all cards, set by set."""
+        return iter(self._cards.values())
+
+    def __len__(self) -> int:
+        """Return the number of distinct cards."""
+        return len(self._cards)
+
+    def select(self, mask: int = 0, sets: Iterable[str] | None = None) -> list[CardSpec]:
+        """Return the cards in sets (default all) that have all the features in mask."""
+        specs = self if sets is None else (spec for cardset in sets for spec in self.sets[cardset])
+        return [spec for spec in specs if spec.features & mask == mask]
+
+    def count(self, mask: int = 0, sets: Iterable[str] | None = None) -> int:
+        """Return the number of physical cards in sets (default all) that have all the features in mask."""
+        return sum(spec.count for spec in self.select(mask, sets))
+
+
+def compile_catalog(sets: dict[str, dict[int, tuple[int, dict]]], names: dict[str, str]) -> Catalog:
+    """Compile card sets in the form of sets.card_sets."""
+    return Catalog(
+        (
+            compile_spec(cardset, number, count, args)
+            for cardset, cards in sets.items()
+            for number, (count, args) in cards.items()
+        ),
+        names,
+    )
+
+
+def _source_key(sources: Iterable[Path]) -> str:
+    """Return a key that changes when the content of any of sources, or the marshal format, changes."""
+    digest = hashlib.sha256(str(marshal.version).encode())
+    for source in sources:
+        digest.update(Path(source).read_bytes())
+    return digest.hexdigest()
+
+
+def _shared(value: object, seen: dict[bytes, tuple]) -> object:
+    """Return value with all equal tuples in it the same object, marshal then writes and reads each once.
+
+    Tuples are compared by their marshal version 2 form, so True and 1 are not equal.
+    """
+    if not isinstance(value, tuple):
+        return value
+    value = tuple(_shared(item, seen) for item in value)
+    return seen.setdefault(marshal.dumps(value, 2), value)
+
+
+def cached_catalog(name: str, sources: Iterable[Path], build: Callable[[], Catalog]) -> Catalog:
+    """Return the catalog cached as name in CACHE_DIR, or build() it and cache it.
+
+    Args:
+        name (str): The name of the cache file.
+        sources (Iterable): The files the catalog is compiled from, the cache is only
+            used if none of them changed since it was written.
+        build (Callable): Compiles the catalog when the cache can not be used.
+    """
+    key = _source_key(sources)
+    cache = CACHE_DIR / f"{name}.catalog"
+    try:
+        cached_key, specs, names = marshal.loads(cache.read_bytes())  # noqa: S302
+    except (OSError, EOFError, ValueError, TypeError):
+        cached_key = None
+    if cached_key == key:
+        return Catalog((CardSpec(*spec) for spec in specs), names)
+
+    compiled = build()
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        partial = cache.with_suffix(f".{os.getpid()}")
+        seen = {}
+        specs = [_shared(tuple(spec), seen) for spec in compiled]
+        partial.write_bytes(marshal.dumps((key, specs, compiled.names)))
+        partial.replace(cache)
+    except OSError as e:
+        logging.debug(f"Could not cache the catalog {name}: {e}")
+    return compiled
+
+
+def _compile_builtin() -> Catalog:
+    """Compile the sets in sets.py."""
+    from .sets import card_sets, set_names
+
+    return compile_catalog(card_sets, set_names)
+
+
+def _card(card: object, where: str) -> tuple[int, dict]:
+    """Return card, from a catalog file, as a (count, arguments) tuple after checking its types.
+
+    Raises:
+        CatalogError: If card is not a count and arguments a Card takes.
+    """
+    if not (isinstance(card, list) and len(card) == 2 and isinstance(card[1], dict)):  # noqa: PLR2004
+        msg = f"{where} is not [count, {{arguments}}]"
+        raise CatalogError(msg)
+    count, args = card
+    if not isinstance(count, int) or isinstance(count, bool) or count < 1:
+        msg = f"{where}: count {count!r} is not a positive integer"
+        raise CatalogError(msg)
+    for attr, value in args.items():
+        if attr in EDGES and not isinstance(value, str):
+            msg = f"{where}: {attr} {value!r} is not a string of directions"
+            raise CatalogError(msg)
+        if attr == "shield":
+            # a card can have more than one shield, like ABM01
+            if not isinstance(value, int) or (value < 1 and not isinstance(value, bool)):
+                msg = f"{where}: shield {value!r} is not true, false or a number of shields"
+                raise CatalogError(msg)
+        elif attr in FEATURE_BITS and not isinstance(value, bool):
+            msg = f"{where}: {attr} {value!r} is not true or false"
+            raise CatalogError(msg)
+        if attr not in EDGES and attr not in FEATURE_BITS:
+            msg = f"{where}: Card have no attribute {attr}"
+            raise CatalogError(msg)
+    return count, args
+
+
+def load_catalog_file(path: Path) -> tuple[dict[str, dict[int, tuple[int, dict]]], dict[str, str]]:
+    """Read the catalog file path, TOML if it ends with .toml else JSON, in the form of sets.card_sets and set_names.
+
+    Raises:
+        CatalogError: If the file is malformed or a card is not valid.
+    """
+    try:
+        if path.suffix.lower() == ".toml":
+            import tomllib
+
+            data = tomllib.loads(path.read_text(encoding="utf-8"))
+        else:
+            data = json.loads(path.read_bytes())
+    except ValueError as e:
+        msg = f"{path}: {e}"
+        raise CatalogError(msg) from e
+    if not isinstance(data, dict):
+        msg = f"{path} is not a table of sets"
+        raise CatalogError(msg)
+    sets, names = {}, {}
+    for cardset, definition in data.items():
+        where = f"{path}: {cardset}"
+        if not re.fullmatch(r"[A-Z]+", cardset):
+            msg = f"{where}: a set is named by capital letters, like CAR"
+            raise CatalogError(msg)
+        if not isinstance(definition, dict) or not isinstance(definition.get("cards"), dict):
+            msg = f"{where} has no table of cards"
+            raise CatalogError(msg)
+        names[cardset] = str(definition.get("name", cardset))
+        sets[cardset] = {}
+        for number, card in definition["cards"].items():
+            if not str(number).isdigit() or int(number) < 1:
+                msg = f"{where}: card number {number} is not a positive integer"
+                raise CatalogError(msg)
+            sets[cardset][int(number)] = _card(card, f"{where}{int(number):02}")
+    return sets, names
+
+
+def _compile_file(path: Path) -> Catalog:
+    """Compile the catalog file path.
+
+    Raises:
+        CatalogError: If the file is malformed or a card is not valid.
+    """
+    sets, names = load_catalog_file(path)
+    try:
+        return compile_catalog(sets, names)
+    except (AttributeError, ValueError) as e:
+        msg = f"{path}: {e}"
+        raise CatalogError(msg) from e
+
+
+def user_catalog(path: Path) -> Catalog:
+    """Return the compiled catalog file path, from the cache if it did not change."""
+    name = hashlib.sha256(str(path.resolve()).encode()).hexdigest()[:16]
+    return cached_catalog(f"user-{name}", [path, *COMPILER], lambda: _compile_file(path))
+
+
+def merge_catalogs(catalogs: Iterable[Catalog]) -> Catalog:
+    """Return one catalog of all the sets in catalogs.
+
+    Raises:
+        CatalogError: If two catalogs have a set with the same name.
+    """
+    catalogs = list(catalogs)
+    names = {}
+    for cards in catalogs:
+        if duplicate := names.keys() & cards.sets.keys():
+            msg = f"The sets {', '.join(sorted(duplicate))} are defined twice"
+            raise CatalogError(msg)
+        names |= cards.names
+    return Catalog(itertools.chain.from_iterable(catalogs), names)
+
+
+def add_catalogs(paths: Iterable[str | Path]) -> None:
+    """Add the sets in the catalog files paths to catalog(), before it is first used."""
+    USER_CATALOGS.extend(Path(path) for path in paths)
+    catalog.cache_clear()
+
+
+def catalog_files() -> list[Path]:
+    """Return the files the catalog is compiled from, sets.py and the catalog files."""
+    return [SETS_FILE, *USER_CATALOGS]
+
+
+@functools.cache
+def catalog() -> Catalog:
+    """Return the compiled sets.card_sets and catalog files, from the cache if none of them changed.
+
+    Raises:
+        CatalogError: If a catalog file is not valid or defines a set again.
+    """
+    builtin = cached_catalog("builtin", [SETS_FILE, *COMPILER], _compile_builtin)
+    if not USER_CATALOGS:
+        return builtin
+    return merge_catalogs([builtin, *(user_catalog(path) for path in USER_CATALOGS)])
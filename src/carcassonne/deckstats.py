@@ -0,0 +1,229 @@
+"""Monte Carlo statistics of drawing the cards of a combination of sets.
+
+The physical cards of the chosen sets are shuffled many times. Over all
+shuffles, for every turn, that is every number of drawn cards, it estimates:
+
+- for each feature, the chance that a card with it has been drawn
+- the mean and standard deviation of the number of shields still in the deck
+- the mean number of field, road, city and river sides drawn, see placement.py
+
+The shuffles are run in batches. With NumPy each batch is a few array
+operations on a (shuffles, cards) array of the turn every card is drawn in. Without
+NumPy the batches are shuffled one by one, and the results differ. Every batch
+has its own seed derived from seed, so the results only depend on the seed,
+the number of shuffles and the batch size, not on the number of processes.
+
+>>> results = simulate(["CAR"], shuffles=1000, seed=1)
+>>> results["cards"], results["features"]["shield"][-1], results["shields_remaining"]["mean"][-1]
+(72, 1.0, 0.0)
+"""
+
+from __future__ import annotations
+
+import contextlib
+import csv
+import functools
+import json
+import math
+import random
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from .catalog import FEATURE_BITS, catalog
+from .placement import edges
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from types import ModuleType
+
+EDGE_NAMES = ("field", "road", "city", "river")
+
+
+@functools.cache
+def _numpy() -> ModuleType | None:
+    """Return numpy, or None if it is not installed. Imported on first use, it is slow to import."""
+    try:
+        import numpy as np
+    except ImportError:  # pragma: no cover
+        return None
+    return np
+
+
+def deck_arrays(
+    sets: Iterable[str], features: Iterable[str]
+) -> tuple[list[str], list[list[int]], list[int], list[list[int]]]:
+    """Return the physical cards of sets and their arrays.
+
+    Returns:
+        tuple: The key of every card, the indices of the cards with each of features, the
+            number of shields on every card and the number of sides of every card of each type.
+    """
+    specs = [spec for cardset in sets for spec in catalog().sets[cardset] for _ in range(spec.count)]
+    having = [[n for n, spec in enumerate(specs) if spec.has(FEATURE_BITS[feature])] for feature in features]
+    # shield is True, or a number for cards with more than one, like ABM01
+    shields = [int(dict(spec.attributes)["shield"]) for spec in specs]
+    sides = [[edges(spec).count(kind) for kind in range(len(EDGE_NAMES))] for spec in specs]
+    return [spec.key for spec in specs], having, shields, sides
+
+
+def _batch(job: tuple) -> dict[str, list]:
+    """Shuffle the deck count times, return the sums the statistics are computed from.
+
+    The sums are, by position in the deck: how often the first card with each feature is
+    there, the total and the total square of the number of shields drawn up to it, and the
+    total number of sides of each type there.
+    """
+    having, shields, sides, count, seed = job
+    np = _numpy()
+    if np is None:
+        return _batch_python(having, shields, sides, count, seed)
+    n = len(shields)
+    rng = np.random.default_rng(np.random.SeedSequence(seed))
+    # position[s, c] is the turn card c is drawn in shuffle s, argsort of random numbers is a random permutation
+    position = rng.random((count, n)).argsort(axis=1)
+    first = [
+        np.bincount(position[:, cards].min(axis=1), minlength=n).tolist() if cards else [0] * n for cards in having
+    ]
+    drawn = np.zeros((count, n), dtype=np.int64)
+    np.put_along_axis(drawn, position, np.array(shields)[np.newaxis, :], axis=1)
+    drawn = drawn.cumsum(axis=1)
+    # times[t, c] is the number of shuffles card c is drawn in turn t
+    times = np.bincount((position * n + np.arange(n)).ravel(), minlength=n * n).reshape(n, n)
+    return {
+        "first": first,
+        "shields": drawn.sum(axis=0).tolist(),
+        "shields_squared": (drawn * drawn).sum(axis=0).tolist(),
+        "sides": (times @ np.array(sides)).T.tolist(),
+    }
+
+
+def _batch_python(
+    having: list[list[int]], shields: list[int], sides: list[list[int]], count: int, seed: tuple[int, ...]
+) -> dict[str, list]:
+    """Like _batch(), shuffling one deck at a time without NumPy."""
+    n = len(shields)
+    rng = random.Random(str(seed))
+    sums = {
+        "first": [[0] * n for _ in having],
+        "shields": [0] * n,
+        "shields_squared": [0] * n,
+        "sides": [[0] * n for _ in EDGE_NAMES],
+    }
+    order = list(range(n))
+    position = [0] * n
+    for _ in range(count):
+        rng.shuffle(order)
+        drawn = 0
+        for turn, card in enumerate(order):
+            position[card] = turn
+            drawn += shields[card]
+            sums["shields"][turn] += drawn
+            sums["shields_squared"][turn] += drawn * drawn
+            for kind, number in enumerate(sides[card]):
+                sums["sides"][kind][turn] += number
+        for feature, cards in enumerate(having):
+            if cards:
+                sums["first"][feature][min(position[card] for card in cards)] += 1
+    return sums
+
+
+def _add(total: list, part: list) -> list:
+    """Add the nested lists of numbers part to total."""
+    return [_add(a, b) if isinstance(a, list) else a + b for a, b in zip(total, part, strict=True)]
+
+
+def _cumulative(values: list[float], turns: int, scale: float) -> list[float]:
+    """Return the running sums of values, divided by scale, for the first turns values."""
+    running = 0
+    result = []
+    for value in values[:turns]:
+        running += value
+        result.append(running / scale)
+    return result
+
+
+def simulate(  # noqa: PLR0913
+    sets: Iterable[str],
+    shuffles: int = 100000,
+    turns: int | None = None,
+    seed: int = 0,
+    batch: int = 10000,
+    n_jobs: int = 1,
+    features: Iterable[str] | None = None,
+) -> dict:
+    """Shuffle the cards of sets and estimate the statistics of drawing them, see the module.
+
+    Args:
+        sets (Iterable): The sets to shuffle together.
+        shuffles (int): The number of shuffles.
+        turns (int): The number of turns to report, default all the cards.
+        seed (int): The results only depend on seed, shuffles and batch.
+        batch (int): The number of shuffles done at once.
+        n_jobs (int): The number of processes to shuffle in.
+        features (Iterable): The features to report, default all the features in the deck.
+
+    Returns:
+        dict: The statistics by turn, the first value is after drawing one card.
+    """
+    sets = list(sets)
+    if features is None:
+        features = [feature for feature in FEATURE_BITS if catalog().count(FEATURE_BITS[feature], sets)]
+    features = list(features)
+    keys, having, shields, sides = deck_arrays(sets, features)
+    turns = min(turns or len(keys), len(keys))
+    counts = [min(batch, shuffles - start) for start in range(0, shuffles, batch)]
+    work = [(having, shields, sides, count, (seed, n)) for n, count in enumerate(counts)]
+    sums = None
+    with contextlib.ExitStack() as stack:
+        if n_jobs <= 1 or len(work) <= 1:
+            parts = map(_batch, work)
+        else:
+            parts = stack.enter_context(ProcessPoolExecutor(max_workers=n_jobs)).map(_batch, work)
+        for part in parts:
+            sums = part if sums is None else {name: _add(sums[name], part[name]) for name in sums}
+
+    total = sum(shields)
+    drawn = [value / shuffles for value in sums["shields"][:turns]]
+    squared = [value / shuffles for value in sums["shields_squared"][:turns]]
+    return {
+        "sets": sets,
+        "cards": len(keys),
+        "shuffles": shuffles,
+        "seed": seed,
+        "turns": turns,
+        "features": {
+            feature: _cumulative(first, turns, shuffles) for feature, first in zip(features, sums["first"], strict=True)
+        },
+        "shields_remaining": {
+            "mean": [total - mean for mean in drawn],
+            "std": [math.sqrt(max(0, square - mean * mean)) for mean, square in zip(drawn, squared, strict=True)],
+        },
+        "edges": {name: _cumulative(sums["sides"][kind], turns, shuffles) for kind, name in enumerate(EDGE_NAMES)},
+    }
+
+
+def rows(results: dict) -> list[dict[str, object]]:
+    """Return results as one row per turn."""
+    table = []
+    for turn in range(results["turns"]):
+        row = {"turn": turn + 1}
+        row |= {f"p_{feature}": chances[turn] for feature, chances in results["features"].items()}
+        row["shields_remaining"] = results["shields_remaining"]["mean"][turn]
+        row["shields_remaining_std"] = results["shields_remaining"]["std"][turn]
+        row |= {f"{name}_sides": drawn[turn] for name, drawn in results["edges"].items()}
+        table.append(row)
+    return table
+
+
+def save(results: dict, filename: str) -> None:
+    """Save results in filename, as CSV with a row per turn if it ends with .csv, else as JSON."""
+    with Path(filename).open("w", newline="") as f:
+        if filename.lower().endswith(".csv"):
+            table = rows(results)
+            writer = csv.DictWriter(f, fieldnames=list(table[0]) if table else ["turn"])
+            writer.writeheader()
+            writer.writerows(table)
+        else:
+            json.dump(results, f, indent=1)
+            f.write("\n")
@@ -1,23 +1,182 @@
-"""Entrypoints for scripts."""
+"""Entrypoints for scripts.
 
+The scripts are often run many times from other scripts, so everything a
+command does not always need, like the worker pool, the server or sets.py,
+is imported in the command only when it is used.
+
+--stats is a flag that prints the statistics, so it can stand in front of the
+arguments, --stats-file writes them to a file:
+
+    >>> import json, tempfile
+    >>> from click.testing import CliRunner
+    >>> with tempfile.TemporaryDirectory() as tmp:
+    ...     result = CliRunner().invoke(generate_sets, ["--no-tiles", "--sheet", f"{tmp}/s.svg", "--stats", "RIV"])
+    ...     list(json.loads(result.stdout)["sets"])
+    ['RIV']
+"""
+
+from __future__ import annotations
+
+import contextlib
+import functools
+import json
 import logging
+from pathlib import Path
+from typing import TYPE_CHECKING
 
 import click
 
-from . import Card, __version__, tile_cards
-from .sets import card_sets, set_names
+from . import __version__, asset_cache, compact, stats, stream_cards, tile_cards
+from .archive import is_archive
+from .catalog import FEATURES, USER_CATALOGS, CatalogError, add_catalogs, catalog
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
 
 logger = logging.getLogger()
 
 
+def stats_option(command: Callable) -> Callable:
+    """Add the --stats and --stats-file options to command."""
+    command = click.option(
+        "--stats-file",
+        default=None,
+        type=click.Path(dir_okay=False),
+        help="Write the time and memory used by each stage as JSON to this file.",
+    )(command)
+    return click.option(
+        "--stats",
+        "show_stats",
+        is_flag=True,
+        default=False,
+        help="Print the time and memory used by each stage as JSON.",
+    )(command)
+
+
+compact_option = click.option(
+    "--compact", "compact_output", is_flag=True, default=False, help="Write smaller SVG files."
+)
+precision_option = click.option(
+    "--precision", default=2, type=click.IntRange(min=0), help="Number of decimals in paths with --compact."
+)
+
+
+def load_catalogs(_ctx: click.Context, _param: click.Parameter, value: tuple[str, ...]) -> None:
+    """Add the catalog files in value to the catalog, and check them and those in CARCASSONNE_CATALOGS."""
+    add_catalogs(value)
+    if USER_CATALOGS:
+        try:
+            catalog()
+        except CatalogError as e:
+            raise click.BadParameter(str(e)) from e
+
+
+catalog_option = click.option(
+    "--catalog",
+    multiple=True,
+    type=click.Path(exists=True, dir_okay=False),
+    callback=load_catalogs,
+    expose_value=False,
+    is_eager=True,
+    help="Also use the sets in this TOML or JSON catalog file, may be repeated.",
+)
+
+
+def set_compact(precision: int | None) -> None:
+    """Compact all output with precision decimals in paths, or not if precision is None."""
+    if precision is None:
+        compact.disable()
+    else:
+        compact.enable(precision)
+
+
+def report_stats(stats_file: str | None, *, show: bool) -> None:
+    """Print the collected statistics as JSON if show, and write them to stats_file if given."""
+    if stats_file is None and not show:
+        return
+    report = json.dumps(stats.report(), indent=1)
+    if show:
+        print(report)  # noqa: T201
+    if stats_file is not None:
+        Path(stats_file).write_text(report + "\n")
+
+
+def check_archive(_ctx: click.Context, _param: click.Parameter, value: str | None) -> str | None:
+    """Check that value is named like an archive."""
+    if value and not is_archive(value):
+        msg = f"{value} is not named like a zip or tar archive"
+        raise click.BadParameter(msg)
+    return value
+
+
 @click.command()
 @click.version_option(version=__version__)
 @click.option("--output-dir", default="tiles", help="Directory to write tiles in.")
-@click.option("--feature", default="", help="Only draw tiles with this feature. (default all)")
+@click.option(
+    "--feature",
+    default="",
+    help="Only draw tiles matching this query, like 'shield AND roads:ESW AND NOT river'. (default all)",
+)
 @click.option("--list", "list_sets", is_flag=True, default=False, help="List alls sets (and quit).")
+@click.option("-j", "--jobs", default=1, type=click.IntRange(min=1), help="Number of processes to draw in.")
+@click.option(
+    "--writers",
+    default=1,
+    type=click.IntRange(min=0),
+    help="Number of threads writing tiles while the next are drawn, 0 writes while drawing.",
+)
+@click.option("--seed", default="", help="Global seed, change it to get new looking tiles.")
+@click.option("--force", is_flag=True, default=False, help="Redraw tiles even if they are unchanged.")
+@click.option("--sheet", default=None, help="Also tile all the tiles in this document.")
+@click.option("--width", default=5, type=int, help="Number of cards on each row of the sheet.")
+@click.option("--no-tiles", is_flag=True, default=False, help="Do not write a file for each tile, only the sheet.")
+@click.option(
+    "--archive",
+    default=None,
+    callback=check_archive,
+    help="Write the tiles into this .zip, .tar or .tar.gz/bz2/xz file instead.",
+)
+@click.option("--symbols", is_flag=True, default=False, help="Define each graphic once in the sheet and reuse it.")
+@click.option("--watch", is_flag=True, default=False, help="Draw tiles again when their graphics or sets change.")
+@click.option(
+    "--uniform-copies", is_flag=True, default=False, help="Draw every copy of a card like the first, only once."
+)
+@click.option(
+    "--dedupe",
+    default=None,
+    type=click.Choice(["hardlink", "symlink", "manifest"]),
+    help="Store identical tiles once, the others as links or only in the manifest.",
+)
+@compact_option
+@precision_option
+@stats_option
 @click.option("-v", "--verbose", count=True, help="Increase verbosity")
+@catalog_option
 @click.argument("sets", nargs=-1)
-def generate_sets(output_dir: str, feature: str, sets: str, *, list_sets: bool, verbose: int) -> None:
+def generate_sets(  # noqa: PLR0913
+    output_dir: str,
+    feature: str,
+    sets: str,
+    jobs: int,
+    writers: int,
+    seed: str,
+    sheet: str | None,
+    width: int,
+    archive: str | None,
+    dedupe: str | None,
+    precision: int,
+    stats_file: str | None,
+    *,
+    show_stats: bool,
+    compact_output: bool,
+    force: bool,
+    no_tiles: bool,
+    symbols: bool,
+    list_sets: bool,
+    watch: bool,
+    uniform_copies: bool,
+    verbose: int,
+) -> None:
     """Generate carcassonne tiles in SETS."""
     if verbose == 1:
         logger.setLevel(logging.INFO)
@@ -25,34 +184,316 @@ def generate_sets(output_dir: str, feature: str, sets: str, *, list_sets: bool,
         logger.setLevel(logging.DEBUG)
 
     if list_sets:
-        for cardset in card_sets:
-            print(f"{cardset}: {set_names[cardset]}")  # noqa: T201
+        for cardset, name in catalog().names.items():
+            print(f"{cardset}: {name}")  # noqa: T201
+        return
+
+    if no_tiles and not sheet:
+        msg = "--no-tiles needs --sheet"
+        raise click.UsageError(msg)
+
+    from .build import card_jobs, draw_cards
+    from .query import QueryError
+
+    select = functools.partial(card_jobs, sets or None, feature)
+    try:
+        selected = select()
+    except QueryError as e:
+        raise click.BadParameter(str(e), param_hint="--feature") from e
+
+    set_compact(precision if compact_output else None)
+    if show_stats or stats_file:
+        stats.enable(memory=True)
+    options = {
+        "output_dir": None if no_tiles or archive else output_dir,
+        "n_jobs": jobs,
+        "writers": writers,
+        "seed": seed,
+        "sheet": sheet,
+        "per_row": width,
+        "symbols": symbols,
+        "archive": archive,
+        "uniform": uniform_copies,
+        "dedupe": dedupe,
+    }
+    failed = draw_cards(selected, force=force, **options)
 
-    if not sets:
-        sets = card_sets.keys()
+    cache = asset_cache.stats()
+    logging.info(f"Asset cache of all processes: {cache['hits']} hits, {cache['misses']} misses")
+    report_stats(stats_file, show=show_stats)
+    if watch:
+        from .watch import watch as watch_files
 
-    for cardset in sets:
-        for n, card in card_sets[cardset].items():
-            for i in range(card[0]):
-                if not feature or feature in card[1]:
-                    Card(f"{cardset}{n:02}-{i+1}", output_dir=output_dir, **card[1]).draw()
+        with contextlib.suppress(KeyboardInterrupt):
+            watch_files(select, **options)
+    elif failed:
+        msg = f"Failed to draw or write {len(failed)} cards: {', '.join(failed)}"
+        raise click.ClickException(msg)
 
 
 @click.command()
 @click.version_option(version=__version__)
 @click.option("--output", default="tiled.svg", help="Document to tile the tiles in.")
 @click.option("--width", default=5, type=int, help="Number of cards on each row.")
+@click.option("--stream", is_flag=True, default=False, help="Write each tile as it is read, using constant memory.")
+@click.option("--symbols", is_flag=True, default=False, help="Define each graphic once and reuse it.")
+@click.option("--page", default=None, help="Split the tiles over pages of this size, like A4, letter or 200x300 (mm).")
+@click.option("--margin", default=10.0, type=click.FloatRange(min=0), help="Margin of each page in mm.")
+@click.option("-j", "--jobs", default=1, type=click.IntRange(min=1), help="Number of processes to write pages in.")
+@click.option("--threads", default=4, type=click.IntRange(min=1), help="Number of threads reading the tiles.")
+@compact_option
+@precision_option
+@stats_option
 @click.argument("tiles", nargs=-1)
-def tiler(output: str, width: int, tiles: list[str]) -> None:
-    """Tile the given tiles/bricks into one document."""
-    tile_cards(output, tiles, width)
+def tiler(  # noqa: PLR0913
+    output: str,
+    width: int,
+    tiles: list[str],
+    page: str | None,
+    margin: float,
+    jobs: int,
+    threads: int,
+    precision: int,
+    stats_file: str | None,
+    *,
+    show_stats: bool,
+    compact_output: bool,
+    stream: bool,
+    symbols: bool,
+) -> None:
+    """Tile the given tiles/bricks into one document, or with --page into one document per page.
+
+    Pages are named after --output, tiled.svg gives tiled-001.svg, tiled-002.svg, ... TILES and
+    --output may be zip or tar archives, the pages are then all written into the archive.
+    TILES may also be directories, glob patterns like 'tiles/CAR*.svg', and @FILE to read
+    the tiles from a list file with one per line.
+    """
+    from .pages import Page, tile_pages
+
+    if page:
+        try:
+            paper = Page.parse(page, margin)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="--page") from e
+    elif stream and is_archive(output):
+        msg = "--stream can not write into an archive"
+        raise click.UsageError(msg)
+
+    set_compact(precision if compact_output else None)
+    if show_stats or stats_file:
+        stats.enable(memory=True)
+    try:
+        if page:
+            files = tile_pages(output, tiles, paper, jobs, symbols=symbols, threads=threads)
+            logging.info(f"Wrote {len(files)} pages of {paper.per_page} tiles")
+        elif stream:
+            stream_cards(output, tiles, width, symbols=symbols, threads=threads)
+        else:
+            tile_cards(output, tiles, width, symbols=symbols, threads=threads)
+    except FileNotFoundError as e:
+        raise click.ClickException(str(e)) from e
+    report_stats(stats_file, show=show_stats)
+
+
+@click.command()
+@click.version_option(version=__version__)
+@click.option("--host", default="127.0.0.1", help="Address to listen on.")
+@click.option("--port", default=8000, type=click.IntRange(0, 65535), help="Port to listen on.")
+@click.option("-j", "--jobs", default=1, type=click.IntRange(min=1), help="Number of processes to draw in.")
+@click.option("--cache-size", default=256, type=click.IntRange(min=0), help="Number of rendered documents to keep.")
+@compact_option
+@precision_option
+@catalog_option
+def serve(host: str, port: int, jobs: int, cache_size: int, precision: int, *, compact_output: bool) -> None:  # noqa: PLR0913
+    """Serve cards and sheets over HTTP, see the server module for the endpoints."""
+    from . import server
+
+    set_compact(precision if compact_output else None)
+    server.serve(host, port, jobs, cache_size)
+
+
+@click.command()
+@click.version_option(version=__version__)
+@click.option("--output", default="board.svg", help="Document to render the board in.")
+@click.option("--viewport", default=None, help="Only render the cells X,Y,WIDTH,HEIGHT. (default all)")
+@click.option("--map-tiles", default=None, help="Also cut the board into map tiles in this directory, as Z/X/Y.svg.")
+@click.option("--zooms", default=3, type=click.IntRange(min=1), help="Number of zoom levels of the map tiles.")
+@click.option("--cards-per-tile", default=4, type=click.IntRange(min=1), help="Cards across a map tile at most zoom.")
+@click.option("--tile-size", default=256, type=click.IntRange(min=1), help="Width and height of a map tile in pixels.")
+@click.option("--seed", default="", help="Global seed, change it to get new looking tiles.")
+@compact_option
+@precision_option
+@stats_option
+@catalog_option
+@click.argument("placements")
+def board(  # noqa: PLR0913
+    output: str,
+    viewport: str | None,
+    map_tiles: str | None,
+    zooms: int,
+    cards_per_tile: int,
+    tile_size: int,
+    seed: str,
+    precision: int,
+    stats_file: str | None,
+    placements: str,
+    *,
+    show_stats: bool,
+    compact_output: bool,
+) -> None:
+    """Render the board in the JSON file PLACEMENTS, a list of [card, x, y, rotation, copy].
+
+    Every distinct card is drawn once and placed with <use>, see the board module.
+    """
+    from .board import BoardRenderer, Viewport, load_placements
+
+    try:
+        shown = Viewport.parse(viewport) if viewport else None
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--viewport") from e
+    try:
+        renderer = BoardRenderer(load_placements(placements), seed)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="PLACEMENTS") from e
+
+    set_compact(precision if compact_output else None)
+    if show_stats or stats_file:
+        stats.enable(memory=True)
+    renderer.write(output, shown)
+    if map_tiles:
+        written = renderer.export_tiles(map_tiles, cards_per_tile, zooms, tile_size)
+        logging.info(f"Wrote {written} map tiles")
+    report_stats(stats_file, show=show_stats)
+
+
+@click.command()
+@click.version_option(version=__version__)
+@click.option("--shuffles", default=100000, type=click.IntRange(min=1), help="Number of shuffles.")
+@click.option("--turns", default=None, type=click.IntRange(min=1), help="Number of turns to report. (default all)")
+@click.option("--seed", default=0, type=click.IntRange(min=0), help="Seed, the same seed gives the same statistics.")
+@click.option("--batch", default=10000, type=click.IntRange(min=1), help="Number of shuffles done at once.")
+@click.option("-j", "--jobs", default=1, type=click.IntRange(min=1), help="Number of processes to shuffle in.")
+@click.option("--feature", "features", multiple=True, help="Feature to report, may be repeated. (default all)")
+@click.option("--output", default="-", help="Write the statistics to this .json or .csv file. (default JSON to stdout)")
+@catalog_option
+@click.argument("sets", nargs=-1)
+def deck_stats(  # noqa: PLR0913
+    shuffles: int,
+    turns: int | None,
+    seed: int,
+    batch: int,
+    jobs: int,
+    features: tuple[str, ...],
+    output: str,
+    sets: tuple[str, ...],
+) -> None:
+    """Estimate the statistics of drawing the cards of SETS (default CAR) by shuffling them many times."""
+    from .deckstats import save, simulate
+
+    sets = sets or ("CAR",)
+    unknown = [name for name in sets if name not in catalog().sets]
+    unknown += [name for name in features if name not in FEATURES]
+    if unknown:
+        msg = f"Unknown sets or features: {', '.join(unknown)}"
+        raise click.UsageError(msg)
+    results = simulate(sets, shuffles, turns, seed, batch, jobs, features or None)
+    if output == "-":
+        print(json.dumps(results, indent=1))  # noqa: T201
+    else:
+        save(results, output)
+
+
+@click.command()
+@click.version_option(version=__version__)
+@click.option("--without", multiple=True, help="Leave out this card, like a second spring, may be repeated.")
+@click.option(
+    "--count", is_flag=True, default=False, help="Count the layouts instead of writing one, slow for combined sets."
+)
+@click.option("--sample", is_flag=True, default=False, help="Write a random layout instead of the first.")
+@click.option("--seed", default=None, type=int, help="Seed of --sample, the same seed gives the same layout.")
+@click.option(
+    "--output", default="-", help="Write the layout to this JSON file, for carcassonne_board. (default stdout)"
+)
+@catalog_option
+@click.argument("sets", nargs=-1)
+def river(  # noqa: PLR0913
+    without: tuple[str, ...], seed: int | None, output: str, sets: tuple[str, ...], *, count: bool, sample: bool
+) -> None:
+    """Lay out the river cards of SETS (default RIV) in one complete river, see the river module."""
+    import random
+
+    from .river import RiverError, layout_json, river_solver, save_layout
+
+    sets = sets or ("RIV",)
+    unknown = [name for name in sets if name not in catalog().sets]
+    if unknown:
+        msg = f"Unknown sets: {', '.join(unknown)}"
+        raise click.UsageError(msg)
+    keys = {spec.key for name in sets for spec in catalog().sets[name]}
+    unknown = [key for key in without if key not in keys]
+    if unknown:
+        msg = f"Cards not in {', '.join(sets)}: {', '.join(unknown)}"
+        raise click.UsageError(msg)
+    try:
+        solver = river_solver(sets, without)
+    except RiverError as e:
+        raise click.ClickException(str(e)) from e
+
+    if count:
+        print(f"{solver.courses()} courses, {solver.count()} layouts")  # noqa: T201
+        return
+    layout = solver.sample(random.Random(seed)) if sample else solver.first()
+    if layout is None:
+        msg = "The river cards can not make a complete river"
+        raise click.ClickException(msg)
+    if output == "-":
+        print(layout_json(layout), end="")  # noqa: T201
+    else:
+        save_layout(layout, output)
 
 
 @click.command()
 @click.version_option(version=__version__)
 def helper() -> None:
     """Helper script during development."""
-    for s in card_sets.values():
-        for c in s.values():
-            for w in c[1].get("river", "").split():
-                print(f'        direction["{w}"] = ("╺", 0)')  # noqa: T201
+    for spec in catalog():
+        for w in spec.river:
+            print(f'        direction["{w}"] = ("╺", 0)')  # noqa: T201
+
+
+@click.command()
+@click.version_option(version=__version__)
+@click.option("--repeat", default=5, type=click.IntRange(min=1), help="Number of times to time each benchmark.")
+@click.option("--output", default=None, help="Save the results as JSON in this file.")
+@click.option("--baseline", default=None, help="Compare with the results saved in this file.")
+@click.option("--threshold", default=0.1, type=float, help="Allowed slowdown compared to the baseline, 0.1 is 10%.")
+@click.argument("benchmarks", nargs=-1)
+def bench(repeat: int, output: str | None, baseline: str | None, threshold: float, benchmarks: list[str]) -> None:
+    """Run the BENCHMARKS (name prefixes, default all) and report their times.
+
+    startup: benchmarks fail when a command starts slower than benchmark.STARTUP_TARGET.
+    """
+    from .benchmark import STARTUP_TARGET, compare, load_results, run_benchmarks, save_results
+
+    results = run_benchmarks(list(benchmarks), repeat)
+    for name, result in results["cases"].items():
+        print(f"{name:24} {result['median'] * 1000:10.2f} ms (min {result['min'] * 1000:.2f} ms)")  # noqa: T201
+    if output:
+        save_results(output, results)
+
+    if baseline:
+        regressions = compare(results, load_results(baseline), threshold)
+        for name, ratio in regressions.items():
+            print(f"Regression: {name} is {ratio:.2f} times slower")  # noqa: T201
+        if regressions:
+            msg = f"{len(regressions)} benchmarks are more than {threshold:.0%} slower than the baseline"
+            raise click.ClickException(msg)
+
+    slow = [
+        name
+        for name, result in results["cases"].items()
+        if name.startswith("startup:") and result["median"] > STARTUP_TARGET
+    ]
+    if slow:
+        msg = f"{', '.join(slow)} started slower than the target of {STARTUP_TARGET * 1000:.0f} ms"
+        raise click.ClickException(msg)
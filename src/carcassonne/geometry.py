@@ -0,0 +1,207 @@
+"""Precompiled paths for the roads, rivers and cities of a card.
+
+Every path of a feature is a fixed function of one random control point a. The
+paths are written down once, below, with a symbolic a, and compiled to a format
+string plus, for each number in the path, its coefficients in a. Drawing a path
+is then a few multiply-adds per number.
+
+>>> import random
+>>> PATHS["city"]["┗"].render(random.Random())
+'M 0 0 Q 25 25 50 50'
+"""
+
+# ruff: noqa: N806
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import random
+
+
+class _Linear:
+    """The symbolic number c + x * a[0] + y * a[1]."""
+
+    __slots__ = ("c", "x", "y")
+
+    def __init__(self, c: float, x: float = 0, y: float = 0) -> None:
+        self.c = c
+        self.x = x
+        self.y = y
+
+    def __add__(self, other: float) -> _Linear:
+        return _Linear(self.c + other, self.x, self.y)
+
+    def __sub__(self, other: float) -> _Linear:
+        return _Linear(self.c - other, self.x, self.y)
+
+    def __truediv__(self, other: float) -> _Linear:
+        return _Linear(self.c / other, self.x / other, self.y / other)
+
+    __radd__ = __add__
+
+
+def _number(value: float) -> str:
+    """Format value like an f-string would, but without a trailing .0."""
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class PathTemplate:
+    """A path compiled to a linear function of its control point."""
+
+    def __init__(self, spread: tuple[tuple[float, float], tuple[float, float]] | None, tokens: list) -> None:
+        """Compile a path.
+
+        Args:
+            spread (tuple): ((scale, offset), (scale, offset)) of the x and y of the random control point,
+                or None if the path does not depend on it.
+            tokens (list): The commands and numbers of the path, numbers may depend on the control point.
+        """
+        self.spread = spread
+        self.coefficients = []
+        parts = []
+        for token in tokens:
+            if isinstance(token, _Linear):
+                self.coefficients.append((token.c, token.x, token.y))
+                parts.append("{}")
+            elif isinstance(token, int | float):
+                parts.append(_number(token))
+            else:
+                parts.append(token)
+        self.format = " ".join(parts)
+
+    def point(self, rng: random.Random) -> tuple[float, float]:
+        """Draw a control point from rng."""
+        (sx, ox), (sy, oy) = self.spread
+        return rng.random() * sx + ox, rng.random() * sy + oy
+
+    def render(self, rng: random.Random) -> str:
+        """Draw the path with a control point from rng."""
+        if not self.coefficients:
+            return self.format
+        ax, ay = self.point(rng)
+        return self.format.format(*(_number(c + x * ax + y * ay) for c, x, y in self.coefficients))
+
+
+def _roads(a: tuple[_Linear, _Linear]) -> dict[str, list]:
+    """Return the paths of the roads."""
+    W1 = (0, 22.5)
+    W2 = (0, 27.5)
+    E1 = (50, 22.5)
+    E2 = (50, 27.5)
+    S1 = (22.5, 50)
+    S2 = (27.5, 50)
+    N1 = (22.5, 0)
+    N2 = (27.5, 0)
+    # fmt: off
+    return {
+        "╺": ["M", E1[0], E1[1],
+              "C", E1[0] - 5, E1[1], a[0] + 5, (a[1] - 2.5 + E1[1]) / 2, a[0], a[1] - 2.5,
+              "Q", a[0] - 5, a[1], a[0], a[1] + 2.5,
+              "C", a[0] + 5, (a[1] + 2.5 + E2[1]) / 2, E2[0] - 5, E2[1], E2[0], E2[1]],
+        "┗": ["M", N1[0], N1[1],
+              "Q", a[0], a[1], E2[0], E2[1],
+              "M", N2[0], N2[1],
+              "Q", a[0] + 4, a[1] - 4, E1[0], E1[1]],
+        "┃": ["M", N1[0], N1[1],
+              "Q", a[0], a[1], S1[0], S1[1],
+              "M", N2[0], N2[1],
+              "Q", a[0] + 5, a[1], S2[0], S2[1]],
+        "┳": ["M", W1[0], W1[1],
+              "Q", a[0] - 5, a[1] - 5, E1[0], E1[1],
+              "M", W2[0], W2[1],
+              "C", a[0] - 2.5, a[1], a[0] - 2.5, a[1], S1[0], S1[1],
+              "M", S2[0], S2[1],
+              "C", a[0] + 2.5, a[1], a[0] + 2.5, a[1], E2[0], E2[1]],
+        "╋": ["M", W2[0], W2[1],
+              "C", a[0] - 2.5, a[1] + 2.5, a[0] - 2.5, a[1] + 2.5, S1[0], S1[1],
+              "M", S2[0], S2[1],
+              "C", a[0] + 2.5, a[1] + 2.5, a[0] + 2.5, a[1] + 2.5, E2[0], E2[1],
+              "M", E1[0], E1[1],
+              "C", a[0] + 2.5, a[1] - 2.5, a[0] + 2.5, a[1] - 2.5, N2[0], N2[1],
+              "M", N1[0], N1[1],
+              "C", a[0] - 2.5, a[1] - 2.5, a[0] - 2.5, a[1] - 2.5, W1[0], W1[1]],
+    }
+    # fmt: on
+
+
+def _rivers(a: tuple[_Linear, _Linear]) -> dict[str, list]:
+    """Return the paths of the rivers."""
+    W1 = (0, 20)
+    W2 = (0, 30)
+    E1 = (50, 20)
+    E2 = (50, 30)
+    S1 = (20, 50)
+    S2 = (30, 50)
+    N1 = (20, 0)
+    N2 = (30, 0)
+    # fmt: off
+    return {
+        "╺": ["M", E1[0], E1[1],
+              "C", E1[0] - 5, E1[1], a[0] + 5, a[1] - 5, a[0], a[1] - 5,
+              "Q", a[0] - 10, a[1], a[0], a[1] + 5,
+              "C", a[0] + 5, a[1] + 5, E2[0] - 5, E2[1], E2[0], E2[1]],
+        "┗": ["M", N1[0], N1[1],
+              "Q", a[0], a[1], E2[0], E2[1],
+              "M", N2[0], N2[1],
+              "Q", a[0] + 8, a[1] - 8, E1[0], E1[1]],
+        "┃": ["M", N1[0], N1[1],
+              "Q", a[0], a[1], S1[0], S1[1],
+              "M", N2[0], N2[1],
+              "Q", a[0] + 10, a[1], S2[0], S2[1]],
+        "┳": ["M", W1[0], W1[1],
+              "Q", a[0], a[1], E1[0], E1[1],
+              "M", W2[0], W2[1],
+              "C", a[0] - 5, a[1] + 10, a[0] - 5, a[1] + 10, S1[0], S1[1],
+              "M", S2[0], S2[1],
+              "C", a[0] + 5, a[1] + 10, a[0] + 5, a[1] + 10, E2[0], E2[1]],
+    }
+    # fmt: on
+
+
+def _cities() -> dict[str, list]:
+    """Return the paths of the cities, missing glyphs "┞┦╀╃╄╋╼"."""
+    NW = (0, 0)
+    NE = (0, 50)
+    SE = (50, 50)
+    SW = (50, 0)
+    # fmt: off
+    return {
+        "╺": ["M", NE[0], NE[1], "Q", 25, 25, SE[0], SE[1]],
+        "┗": ["M", NW[0], NW[1], "Q", 25, 25, SE[0], SE[1]],
+        "┃": ["M", NW[0], NW[1], "Q", 25, 15, SW[0], SW[1],
+              "M", NE[0], NE[1], "Q", 25, 35, SE[0], SE[1]],
+        "┳": ["M", NW[0], NW[1], "Q", 10, 25, NE[0], NE[1]],
+    }
+    # fmt: on
+
+
+# style of every road, river and city path
+PATH_STYLE = (
+    "fill:none;stroke:#000000;stroke-width:0.264583px;stroke-linecap:butt;stroke-linejoin:miter;stroke-opacity:1"
+)
+
+# ((scale, offset), (scale, offset)) of the random control point of each path
+_spread = {
+    "road": {
+        "╺": ((5, 22.5), (10, 20)),
+        "┗": ((10, 20), (10, 20)),
+        "┃": ((10, 17.5), (10, 20)),
+        "┳": ((10, 20), (10, 22.5)),
+        "╋": ((20, 15), (20, 15)),
+    },
+    "river": {
+        "╺": ((5, 22.5), (10, 20)),
+        "┗": ((10, 20), (10, 20)),
+        "┃": ((10, 17.5), (10, 20)),
+        "┳": ((10, 20), (10, 15)),
+    },
+}
+_a = (_Linear(0, 1, 0), _Linear(0, 0, 1))
+
+PATHS = {
+    "road": {glyph: PathTemplate(_spread["road"][glyph], tokens) for glyph, tokens in _roads(_a).items()},
+    "river": {glyph: PathTemplate(_spread["river"][glyph], tokens) for glyph, tokens in _rivers(_a).items()},
+    "city": {glyph: PathTemplate(None, tokens) for glyph, tokens in _cities().items()},
+}
@@ -0,0 +1,163 @@
+"""Inputs of the tiler: where the cards come from, and reading their tiles.
+
+Cards can be given as SVG files, zip or tar archives, directories, glob
+patterns and list files:
+
+- a directory stands for the SVG files in it, and the tiles a deduplicated build
+  only recorded in its manifest
+- a glob pattern, like tiles/CAR*.svg, stands for the files it matches
+- @cards.txt is a list file, one card per line relative to the list file, blank
+  lines and lines starting with # are skipped. Decks too large for the command
+  line can be tiled from one. Entries may be anything above, even list files.
+
+Directories and globs are in natural order of the names, CAR01-2 before
+CAR01-10, so the layout only depends on the files.
+
+The files are read on a pool of threads, a bounded window ahead of the card
+being placed, and handed out in order. Parsing stays in the thread placing the
+cards, where identical cards are parsed once. Only the tile group of a card is
+used: it is parsed incrementally and parsing stops at the end of the tile group,
+the rest of the document is never read into a tree.
+
+>>> natural_key("CAR01-10") > natural_key("CAR01-2")
+True
+>>> parse_tile(b'<svg><defs/><g id="tile"><path/></g><metadata/></svg>')[0].tag
+'path'
+"""
+
+from __future__ import annotations
+
+import glob
+import re
+import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from .archive import Member, expand_cards, read_cards
+from .stats import stage
+
+if TYPE_CHECKING:
+    from collections.abc import Container, Iterable, Iterator
+
+# bytes fed to the parser at a time
+CHUNK = 16384
+
+
+def natural_key(name: str) -> tuple:
+    """Return a sort key of name that orders the numbers in it by value."""
+    return tuple(int(part) if part.isdigit() else part for part in re.split(r"(\d+)", name))
+
+
+def _directory(path: Path) -> list[str]:
+    """Return the tiles in the directory path, a tile only in the manifest as the file it refers to."""
+    from .build import load_manifest
+
+    files = {tile.stem: tile for tile in path.glob("*.svg")}
+    for name, original in load_manifest(str(path), "links").items():
+        if name not in files and original in files:
+            files[name] = files[original]
+    return [str(files[name]) for name in sorted(files, key=natural_key)]
+
+
+def _list_file(path: Path) -> list[str]:
+    """Return the entries of the list file path, relative to its directory, list files in it keep their @."""
+    lines = (line.strip() for line in path.read_text().splitlines())
+    return [
+        f"@{path.parent / line[1:]}" if line.startswith("@") else str(path.parent / line)
+        for line in lines
+        if line and not line.startswith("#")
+    ]
+
+
+def expand_inputs(inputs: Iterable[str | Member]) -> list[str | Member]:
+    """Replace the directories, globs, list files and archives in inputs with the cards they stand for.
+
+    Raises:
+        FileNotFoundError: If a glob pattern matches nothing.
+    """
+    cards = []
+    for entry in inputs:
+        # most entries are cards, they are taken without looking at the file system
+        if (
+            isinstance(entry, Member)
+            or (entry.lower().endswith(".svg") and not glob.has_magic(entry))
+            or Path(entry).is_file()
+        ):
+            cards.append(entry)
+        elif entry.startswith("@"):
+            cards.extend(expand_inputs(_list_file(Path(entry[1:]))))
+        elif Path(entry).is_dir():
+            cards.extend(_directory(Path(entry)))
+        elif glob.has_magic(entry):
+            matches = sorted(glob.glob(entry, recursive=True), key=natural_key)  # noqa: PTH207
+            if not matches:
+                msg = f"No cards match {entry}"
+                raise FileNotFoundError(msg)
+            cards.extend(expand_inputs(matches))
+        else:
+            cards.append(entry)
+    return expand_cards(cards)
+
+
+def parse_tile(data: bytes) -> ET.Element:
+    """Return the tile group of the card data, parsing no further than its end.
+
+    Raises:
+        TypeError: If the card has no tile group, like get_element().
+    """
+    with stage("parse"):
+        parser = ET.XMLPullParser(("end",))
+        for start in range(0, len(data), CHUNK):
+            parser.feed(data[start : start + CHUNK])
+            for _, element in parser.read_events():
+                if element.get("id") == "tile":
+                    return element
+    msg = "The card has no tile group"
+    raise TypeError(msg)
+
+
+def _read(path: str) -> bytes:
+    """Return the content of the file path."""
+    with stage("read") as read:
+        data = Path(path).read_bytes()
+        read.size = len(data)
+    return data
+
+
+def load_tiles(
+    cards: list[str | Member], threads: int = 4, known: Container[bytes] = ()
+) -> Iterator[tuple[bytes, ET.Element | None]]:
+    """Yield the content and tile group of each card, as returned by expand_inputs(), in order.
+
+    Args:
+        cards (list): The cards, files or members of archives.
+        threads (int): The number of threads reading files, 1 or less reads in this thread.
+        known (Container): Contents already parsed, for these the tile group is None.
+    """
+    for data in _read_all(cards, threads):
+        yield data, None if data in known else parse_tile(data)
+
+
+def _read_all(cards: list[str | Member], threads: int) -> Iterator[bytes]:
+    """Yield the content of each card in order, reading the files on threads."""
+    # archives are read in this thread, in order, the files on the threads
+    members = read_cards(card for card in cards if isinstance(card, Member))
+    if threads <= 1:
+        for card in cards:
+            yield next(members) if isinstance(card, Member) else _read(card)
+        return
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="reader") as executor:
+        window = deque()
+        for card in cards:
+            window.append(next(members) if isinstance(card, Member) else executor.submit(_read, card))
+            if len(window) >= 4 * threads:
+                yield _result(window.popleft())
+        while window:
+            yield _result(window.popleft())
+
+
+def _result(read: bytes | Future) -> bytes:
+    """Return the content of a card, waiting for it if it is still being read."""
+    return read if isinstance(read, bytes) else read.result()
@@ -0,0 +1,141 @@
+"""Paged output: tiles split over pages of a fixed paper size, one file per page.
+
+A page holds as many 50 mm cards, 60 mm apart, as fit inside its margins. The
+pages are independent documents, so they are written concurrently on a pool
+of worker processes, to a file each or all into one archive.
+
+>>> page = Page.parse("A4", margin=10)
+>>> page.columns, page.rows, page.per_page
+(3, 4, 12)
+>>> page_files("tiled.svg", 2)
+['tiled-001.svg', 'tiled-002.svg']
+"""
+
+from __future__ import annotations
+
+import contextlib
+import io
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple
+
+from . import compact, stats, stream_cards, warm_worker
+from .archive import ArchiveWriter, archive_member, is_archive
+from .inputs import expand_inputs
+
+if TYPE_CHECKING:
+    from .archive import Member
+
+# width and height in mm of the known paper sizes
+PAPER = {
+    "a5": (148, 210),
+    "a4": (210, 297),
+    "a3": (297, 420),
+    "letter": (215.9, 279.4),
+    "legal": (215.9, 355.6),
+}
+CARD = 50
+PITCH = 60
+
+
+class Page(NamedTuple):
+    """Paper size and margin of a page, in mm."""
+
+    width: float
+    height: float
+    margin: float = 10
+
+    @classmethod
+    def parse(cls, size: str, margin: float = 10) -> Page:
+        """Return the page of size, a name in PAPER or WIDTHxHEIGHT in mm, like 200x300.
+
+        Raises:
+            ValueError: If size is unknown or not even one card fits on the page.
+        """
+        if size.lower() in PAPER:
+            width, height = PAPER[size.lower()]
+        elif match := re.fullmatch(r"(\d+(?:\.\d+)?)x(\d+(?:\.\d+)?)", size):
+            width, height = float(match.group(1)), float(match.group(2))
+        else:
+            msg = f"Unknown page size {size}, use one of {', '.join(PAPER)} or WIDTHxHEIGHT in mm"
+            raise ValueError(msg)
+        page = cls(width, height, margin)
+        if page.per_page < 1:
+            msg = f"No card fits on a {size} page with {margin} mm margins"
+            raise ValueError(msg)
+        return page
+
+    @property
+    def columns(self) -> int:
+        """Return the number of cards on each row."""
+        return max(0, int((self.width - 2 * self.margin - CARD) // PITCH) + 1)
+
+    @property
+    def rows(self) -> int:
+        """Return the number of rows of cards."""
+        return max(0, int((self.height - 2 * self.margin - CARD) // PITCH) + 1)
+
+    @property
+    def per_page(self) -> int:
+        """Return the number of cards on the page."""
+        return self.columns * self.rows
+
+
+def page_files(filename: str, count: int) -> list[str]:
+    """Return the names of count pages, numbered after the stem of filename."""
+    path = Path(filename)
+    digits = max(3, len(str(count)))
+    return [str(path.with_name(f"{path.stem}-{n + 1:0{digits}}{path.suffix}")) for n in range(count)]
+
+
+def paginate(cards: list[str], page: Page) -> list[list[str]]:
+    """Split cards in pages."""
+    return [cards[n : n + page.per_page] for n in range(0, len(cards), page.per_page)]
+
+
+def _write_page(job: tuple[str, list[str | Member], Page, bool, bool, int]) -> tuple[dict, bytes | None]:
+    """Write one page, return its statistics and, if it is kept in memory, the page."""
+    filename, cards, page, symbols, in_memory, threads = job
+    with stats.collect() as collected:
+        target = io.StringIO() if in_memory else filename
+        stream_cards(target, cards, page.columns, symbols=symbols, page=page, threads=threads)
+    return collected, target.getvalue().encode() if in_memory else None
+
+
+def tile_pages(  # noqa: PLR0913
+    filename: str, cards: list[str], page: Page, n_jobs: int = 1, *, symbols: bool = False, threads: int = 4
+) -> list[str]:
+    """Tile the graphics in cards on pages, each page written to its own file.
+
+    Args:
+        filename (str): The pages are named after it, tiled.svg gives tiled-001.svg, tiled-002.svg, ...
+            If it is a zip or tar archive, the pages are written into it, tiled.zip gives tiled-001.svg, ...
+        cards (list): The cards in order, files, archives, directories, globs or list files, see inputs.py.
+        page (Page): The size of every page.
+        n_jobs (int): The number of processes to write pages in, 1 writes in this process.
+        symbols (bool): Define each feature graphic once on each page and <use> it in the cards.
+        threads (int): The number of threads reading the cards of each page.
+
+    Returns:
+        list: The names of the written pages, or of the pages in the archive.
+    """
+    pages = paginate(expand_inputs(cards), page)
+    archive = is_archive(filename)
+    files = page_files(archive_member(filename) if archive else filename, len(pages))
+    work = [(name, on_page, page, symbols, archive, threads) for name, on_page in zip(files, pages, strict=True)]
+    with contextlib.ExitStack() as stack:
+        if n_jobs <= 1 or len(work) <= 1:
+            results = map(_write_page, work)
+        else:
+            memory = stats.memory() if stats.enabled() else None
+            executor = stack.enter_context(
+                ProcessPoolExecutor(max_workers=n_jobs, initializer=warm_worker, initargs=(memory, compact.precision()))
+            )
+            results = executor.map(_write_page, work)
+        writer = stack.enter_context(ArchiveWriter(filename)) if archive else None
+        for name, (collected, data) in zip(files, results, strict=True):
+            stats.merge(collected)
+            if writer is not None:
+                writer.add(name, data)
+    return files
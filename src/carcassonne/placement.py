@@ -0,0 +1,186 @@
+"""Legal placement of cards on a board, by the edges of the cards.
+
+Every side of a card is a field, road, city or river, given by the roads,
+city and river directions of the card. A lowercase direction, like the sw in
+ENsw, is a city that only touches that side, the side is not a city side.
+The four sides of a card are packed into an 8-bit signature, 2 bits per side
+in the order N, E, S, W, and the signatures of each card in its 4 rotations
+are computed once, in a SignatureTable.
+
+A Board keeps the placed cards by position and, for every open spot next to
+them, which sides are constrained by a neighbour and what they must be. A card
+fits an open spot in a rotation when its rotated signature, masked by the
+constrained sides, equals what they must be, so listing the legal placements
+of a card is a few integer operations per open spot.
+
+Positions are (x, y), x grows to the east and y to the south, like on a sheet.
+A rotation is a number of quarter turns clockwise, like the rotations in
+Card.direction.
+
+>>> board = Board()
+>>> board.place("CAR14", (0, 0))
+>>> describe(board.tiles[0, 0].signature)
+'CFFF'
+>>> board.legal("CAR14")[:4]
+[((0, -1), 2), ((1, 0), 0), ((1, 0), 1), ((1, 0), 2)]
+>>> board.legal("CAR24")  # roads on every side, but no side next to the card is a road
+[]
+"""
+
+from __future__ import annotations
+
+import functools
+import random
+from typing import TYPE_CHECKING, NamedTuple
+
+from .catalog import catalog
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from .catalog import CardSpec
+
+FIELD, ROAD, CITY, RIVER = range(4)
+EDGE_LETTERS = "FRCV"
+SIDES = "NESW"
+# position offset of the neighbour on each side
+OFFSETS = ((0, -1), (1, 0), (0, 1), (-1, 0))
+
+
+class PlacementError(ValueError):
+    """A card does not fit where it is placed."""
+
+
+def edges(spec: CardSpec) -> tuple[int, int, int, int]:
+    """Return the type of the N, E, S and W side of the card spec, a city wins over a river over a road."""
+    sides = [FIELD] * 4
+    for kind, directions in ((ROAD, spec.roads), (RIVER, spec.river), (CITY, spec.city)):
+        for direction in directions:
+            for letter in direction:
+                if letter in SIDES:
+                    sides[SIDES.index(letter)] = kind
+    return tuple(sides)
+
+
+def signature(sides: Iterable[int]) -> int:
+    """Pack the types of the N, E, S and W side into a signature."""
+    return sum(kind << 2 * side for side, kind in enumerate(sides))
+
+
+def rotate(sig: int, rotation: int) -> int:
+    """Return the signature sig turned rotation quarter turns clockwise."""
+    shift = 2 * (rotation % 4)
+    return ((sig << shift) | (sig >> (8 - shift))) & 0xFF
+
+
+def describe(sig: int) -> str:
+    """Return the sides of sig as letters, F, R, C or V (river) for N, E, S and W."""
+    return "".join(EDGE_LETTERS[sig >> 2 * side & 3] for side in range(4))
+
+
+@functools.cache
+def fits(sig: int, mask: int, want: int) -> tuple[int, ...]:
+    """Return the rotations of sig whose sides in mask are want, rotations giving the same sides only once."""
+    seen = set()
+    rotations = []
+    for rotation in range(4):
+        rotated = rotate(sig, rotation)
+        if rotated & mask == want and rotated not in seen:
+            seen.add(rotated)
+            rotations.append(rotation)
+    return tuple(rotations)
+
+
+class SignatureTable:
+    """The signature of every card in every rotation."""
+
+    def __init__(self, cards: Iterable[CardSpec]) -> None:
+        """Compute the signatures of cards."""
+        self.base = {spec.key: signature(edges(spec)) for spec in cards}
+        self.rotated = {key: tuple(rotate(sig, rotation) for rotation in range(4)) for key, sig in self.base.items()}
+
+    def __getitem__(self, key: str) -> tuple[int, int, int, int]:
+        """Return the signatures of the card key in rotation 0, 1, 2 and 3."""
+        return self.rotated[key]
+
+
+@functools.cache
+def signature_table() -> SignatureTable:
+    """Return the signatures of the cards in the catalog, computed on the first call."""
+    return SignatureTable(catalog())
+
+
+class Placed(NamedTuple):
+    """A card on a board."""
+
+    key: str
+    rotation: int
+    signature: int  # of the card in its rotation
+
+
+class Board:
+    """A sparse board of placed cards and the open spots next to them."""
+
+    def __init__(self, table: SignatureTable | None = None) -> None:
+        """Create an empty board, table has the signatures of the cards (default the catalog)."""
+        self.table = table or signature_table()
+        self.tiles: dict[tuple[int, int], Placed] = {}
+        # open spot: (mask of the constrained sides, what they must be), the first card goes anywhere
+        self.open: dict[tuple[int, int], tuple[int, int]] = {(0, 0): (0, 0)}
+
+    def __len__(self) -> int:
+        """Return the number of placed cards."""
+        return len(self.tiles)
+
+    def fits(self, key: str, position: tuple[int, int], rotation: int) -> bool:
+        """Return True if the card key fits at position in rotation."""
+        if position not in self.open:
+            return False
+        mask, want = self.open[position]
+        return self.table[key][rotation % 4] & mask == want
+
+    def legal(self, key: str) -> list[tuple[tuple[int, int], int]]:
+        """Return every (position, rotation) where the card key fits, rotations giving the same sides only once."""
+        sig = self.table.base[key]
+        return [
+            (position, rotation) for position, (mask, want) in self.open.items() for rotation in fits(sig, mask, want)
+        ]
+
+    def playable(self, key: str) -> bool:
+        """Return True if the card key fits anywhere."""
+        sig = self.table.base[key]
+        return any(fits(sig, mask, want) for mask, want in self.open.values())
+
+    def place(self, key: str, position: tuple[int, int], rotation: int = 0, *, check: bool = True) -> None:
+        """Place the card key at position in rotation.
+
+        Raises:
+            PlacementError: If check and the card does not fit there.
+        """
+        if check and not self.fits(key, position, rotation):
+            msg = f"{key} does not fit at {position} in rotation {rotation}"
+            raise PlacementError(msg)
+        sig = self.table[key][rotation % 4]
+        self.tiles[position] = Placed(key, rotation % 4, sig)
+        self.open.pop(position, None)
+        x, y = position
+        for side, (dx, dy) in enumerate(OFFSETS):
+            neighbour = (x + dx, y + dy)
+            if neighbour in self.tiles:
+                continue
+            # the opposite side of the neighbour must match this side
+            opposite = (side + 2) % 4
+            kind = sig >> 2 * side & 3
+            mask, want = self.open.get(neighbour, (0, 0))
+            self.open[neighbour] = (mask | 3 << 2 * opposite, want | kind << 2 * opposite)
+
+
+def random_game(keys: Iterable[str], rng: random.Random | None = None) -> Board:
+    """Place the cards keys, in order, each at a random legal placement, skipping cards that fit nowhere."""
+    rng = rng or random.Random()
+    board = Board()
+    for key in keys:
+        placements = board.legal(key)
+        if placements:
+            board.place(key, *rng.choice(placements), check=False)
+    return board
@@ -0,0 +1,146 @@
+"""Inverted index over the catalog and a small query language on top of it.
+
+The index maps every term to the keys of the cards it matches:
+
+- a feature, like ``shield`` or ``tower``
+- an edge type, ``roads``, ``city`` or ``river``: the card has that edge
+- an edge type and direction, like ``roads:ESW``, or glyph, like ``roads:┳``
+- a set, like ``set:CAR``
+
+Terms are combined with ``AND``, ``OR``, ``NOT`` and parentheses, NOT binds
+tighter than AND, which binds tighter than OR.
+
+>>> index().query("tower AND city AND NOT shield")[:3]
+['TOW01', 'TOW02', 'TOW03']
+>>> index().query("set:CAR AND (roads:┳ OR roads:ESW)")
+['CAR18', 'CAR23']
+"""
+
+from __future__ import annotations
+
+import functools
+import re
+from typing import TYPE_CHECKING
+
+from . import Card
+from .catalog import EDGES, FEATURE_BITS, FEATURES, catalog
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from .catalog import Catalog
+
+OPERATORS = ("AND", "OR", "NOT")
+GLYPHS = frozenset(glyph for glyph, _ in Card.direction.values())
+
+
+class QueryError(ValueError):
+    """A query that can not be parsed, or uses an unknown term."""
+
+
+class Index:
+    """Inverted index from term to card keys."""
+
+    def __init__(self, cards: Catalog) -> None:
+        """Index all the cards in cards."""
+        self.order = {spec.key: n for n, spec in enumerate(cards)}
+        self.all = frozenset(self.order)
+        postings: dict[str, set[str]] = {term: set() for term in (*FEATURES, *EDGES)}
+        for spec in cards:
+            for feature, bit in FEATURE_BITS.items():
+                if spec.has(bit):
+                    postings[feature].add(spec.key)
+            for edge in EDGES:
+                for direction in getattr(spec, edge):
+                    postings[edge].add(spec.key)
+                    postings.setdefault(f"{edge}:{direction}", set()).add(spec.key)
+                    postings.setdefault(f"{edge}:{Card.direction[direction][0]}", set()).add(spec.key)
+            postings.setdefault(f"set:{spec.set}", set()).add(spec.key)
+        self.postings = {term: frozenset(keys) for term, keys in postings.items()}
+
+    def term(self, term: str) -> frozenset[str]:
+        """Return the keys of the cards matching term."""
+        if term in self.postings:
+            return self.postings[term]
+        edge, _, direction = term.partition(":")
+        if edge in EDGES and (direction in Card.direction or direction in GLYPHS):
+            return frozenset()
+        msg = f"Unknown term {term!r}"
+        raise QueryError(msg)
+
+    def query(self, text: str) -> list[str]:
+        """Return the keys of the cards matching the query text, in catalog order."""
+        return self.sort(_Parser(self, text).parse())
+
+    def sort(self, keys: Iterable[str]) -> list[str]:
+        """Return keys in catalog order."""
+        return sorted(keys, key=self.order.__getitem__)
+
+
+class _Parser:
+    """Recursive descent parser evaluating a query while it is parsed."""
+
+    def __init__(self, index: Index, text: str) -> None:
+        self.index = index
+        self.tokens = re.findall(r"\(|\)|[^\s()]+", text)
+        self.pos = 0
+
+    def parse(self) -> frozenset[str]:
+        if not self.tokens:
+            return self.index.all
+        keys = self._or()
+        if self.pos < len(self.tokens):
+            msg = f"Unexpected {self.tokens[self.pos]!r} in query"
+            raise QueryError(msg)
+        return keys
+
+    def _peek(self) -> str | None:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def _accept(self, operator: str) -> bool:
+        word = self._peek()
+        if word is not None and word.upper() == operator:
+            self.pos += 1
+            return True
+        return False
+
+    def _or(self) -> frozenset[str]:
+        keys = self._and()
+        while self._accept("OR"):
+            keys |= self._and()
+        return keys
+
+    def _and(self) -> frozenset[str]:
+        keys = self._not()
+        while self._accept("AND"):
+            keys &= self._not()
+        return keys
+
+    def _not(self) -> frozenset[str]:
+        if self._accept("NOT"):
+            return self.index.all - self._not()
+        return self._atom()
+
+    def _atom(self) -> frozenset[str]:
+        word = self._peek()
+        if word is None:
+            msg = "Query ends too early"
+            raise QueryError(msg)
+        self.pos += 1
+        if word == "(":
+            keys = self._or()
+            if self._peek() != ")":
+                msg = "Missing ) in query"
+                raise QueryError(msg)
+            self.pos += 1
+            return keys
+        if word == ")" or word.upper() in OPERATORS:
+            msg = f"Unexpected {word!r} in query"
+            raise QueryError(msg)
+        return self.index.term(word)
+
+
+@functools.cache
+def index() -> Index:
+    """Return the index of the catalog, built on the first call."""
+    return Index(catalog())
@@ -0,0 +1,302 @@
+"""Complete layouts of river cards, found, counted or sampled.
+
+A river layout places every river card of a deck so that the river is one
+connected course without loops: every river side of a card faces a river side
+of its neighbour, no river runs into a card without a river on that side, and
+no river end is left open. Only the river is matched, the other sides of the
+cards are not.
+
+For the course only the river sides of a card matter, so cards are grouped by
+their shape: an end (spring or lake), a straight, a bend, a fork or a cross.
+For every shape and every side the river enters it from, the river sides of its
+rotations are computed once, rotations giving the same river sides only once,
+like fits() in placement.py. The solver grows the course from the first spring
+at (0, 0) in rotation 0, always continuing the first open end. A state is the
+open ends, the remaining cards of each shape and the placed cells the remaining
+cards can still run into, relative to the first open end: cells within as many
+cards of an open end as are left, and only ahead of it when one turn is left,
+so states reached along different courses are the same. For each state the
+solver remembers whether it can be completed, which prunes dead ends while
+layouts are listed or sampled, and how many courses complete it, for counting.
+A deck whose ends, forks and crosses can not make one course is rejected before
+searching.
+
+Listing and sampling layouts starts right away, counting explores every state:
+the combined RIV and RII decks, with one spring and one lake left out, have
+over a hundred million courses, listed at once but counted in minutes.
+
+A layout is a course with a card of the right shape in every cell, so every
+course gives the product of the factorials of the number of cards of each shape
+layouts. Layouts can be written as placements for the board renderer.
+
+>>> solver = RiverSolver(catalog().sets["RIV"])
+>>> solver.courses(), solver.count()
+(112, 161280)
+>>> solver.first()[:2]
+[Placement(key='RIV01', x=0, y=0, rotation=0, copy=1), Placement(key='RIV03', x=1, y=0, rotation=0, copy=1)]
+"""
+
+from __future__ import annotations
+
+import functools
+import json
+import math
+import random
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple
+
+from .board import Placement
+from .catalog import FEATURE_BITS, catalog
+from .placement import OFFSETS, SIDES
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+    from .catalog import CardSpec
+
+SHAPES = {0b0001: "end", 0b0101: "straight", 0b0011: "bend", 0b0111: "fork", 0b1111: "cross"}
+END = 0b0001
+STRAIGHT = 0b0101
+
+
+class RiverError(ValueError):
+    """The river cards can not make a complete layout."""
+
+
+def river_sides(spec: CardSpec) -> int:
+    """Return the river sides of the card spec as a mask, bit 0 is N, then E, S and W."""
+    return functools.reduce(int.__or__, (1 << SIDES.index(letter) for edge in spec.river for letter in edge), 0)
+
+
+def rotate_sides(sides: int, rotation: int) -> int:
+    """Return the side mask sides turned rotation quarter turns clockwise."""
+    rotation %= 4
+    return ((sides << rotation) | (sides >> (4 - rotation))) & 0xF
+
+
+def shape(sides: int) -> int:
+    """Return the shape of the side mask sides, its smallest rotation."""
+    return min(rotate_sides(sides, rotation) for rotation in range(4))
+
+
+@functools.cache
+def exits(form: int, entry: int) -> tuple[int, ...]:
+    """Return the river sides of the rotations of the shape form with a river on the side entry."""
+    return tuple(dict.fromkeys(sides for r in range(4) if (sides := rotate_sides(form, r)) >> entry & 1))
+
+
+def _reachable(dx: int, dy: int, entry: int, turns: int, steps: int) -> bool:
+    """Return True if a river entering a cell from the side entry can get dx, dy away in steps cards and turns turns.
+
+    With no turn the river only goes straight ahead, with one it stays ahead of the cell, and
+    it takes two turns to get behind it and three to get right behind it.
+    """
+    fx, fy = OFFSETS[(entry + 2) % 4]
+    ahead = dx * fx + dy * fy
+    aside = fx * dy - fy * dx
+    needed = (0 if aside == 0 else 1) if ahead >= 0 else (2 if aside else 3)
+    return needed <= turns and abs(ahead) + abs(aside) <= steps
+
+
+class Slot(NamedTuple):
+    """A cell of a course and the river sides of the card in it."""
+
+    x: int
+    y: int
+    sides: int
+
+
+class RiverSolver:
+    """Find, count and sample the complete river layouts of a deck of river cards."""
+
+    def __init__(self, cards: Iterable[CardSpec]) -> None:
+        """Prepare to lay out every physical copy of the river cards in cards, other cards are left out.
+
+        Raises:
+            RiverError: If there are no river cards, or their ends, forks and crosses can not make one course.
+        """
+        self.deck = [spec for spec in cards for _ in range(spec.count) if river_sides(spec)]
+        if not self.deck:
+            msg = "There are no river cards"
+            raise RiverError(msg)
+        ends = [spec for spec in self.deck if shape(river_sides(spec)) == END]
+        springs = [spec for spec in ends if spec.has(FEATURE_BITS["spring"])]
+        self.start = (springs or ends or self.deck)[0]
+        self.rest = list(self.deck)
+        self.rest.remove(self.start)
+        self.shapes = sorted({shape(river_sides(spec)) for spec in self.rest})
+        self.counts = tuple(sum(shape(river_sides(spec)) == form for spec in self.rest) for form in self.shapes)
+        # every card closes an open end and opens one for each other river side
+        balance = river_sides(self.start).bit_count() + sum(
+            (form.bit_count() - 2) * count for form, count in zip(self.shapes, self.counts, strict=True)
+        )
+        if balance:
+            msg = (
+                f"The river would have {abs(balance)} {'open end' if balance > 0 else 'end'}"
+                f"{'s' if abs(balance) > 1 else ''}{'' if balance > 0 else ' too many'}, "
+                f"{'add' if balance > 0 else 'leave out'} springs or lakes"
+            )
+            raise RiverError(msg)
+        # the shapes that can turn the river, all but ends and straights
+        self.turning = tuple(form not in {END, STRAIGHT} for form in self.shapes)
+        self.memo: dict[tuple, int] = {}
+        self.possible: dict[tuple, bool] = {}
+
+    def _start(self) -> tuple[frozenset, tuple, tuple[int, ...]]:
+        """Return the state with the first card placed at (0, 0) in rotation 0."""
+        sides = river_sides(self.start)
+        ends = tuple(sorted((*OFFSETS[side], (side + 2) % 4) for side in range(4) if sides >> side & 1))
+        return frozenset([(0, 0)]), ends, self.counts
+
+    @staticmethod
+    def _children(
+        occupied: frozenset, ends: tuple, remaining: tuple[int, ...], forms: list[int]
+    ) -> Iterator[tuple[Slot, int, tuple[frozenset, tuple, tuple[int, ...]]]]:
+        """Yield every way to continue the first open end: the slot, the shape index and the new state."""
+        x, y, entry = ends[0]
+        rest = ends[1:]
+        taken = occupied | {(x, y)}
+        for index, form in enumerate(forms):
+            if not remaining[index]:
+                continue
+            left = (*remaining[:index], remaining[index] - 1, *remaining[index + 1 :])
+            for sides in exits(form, entry):
+                new = []
+                for side in range(4):
+                    if side == entry or not sides >> side & 1:
+                        continue
+                    dx, dy = OFFSETS[side]
+                    cell = (x + dx, y + dy)
+                    # a river into a placed card or meeting another open end would close a loop
+                    if cell in taken or any(end[:2] == cell for end in rest):
+                        break
+                    new.append((*cell, (side + 2) % 4))
+                else:
+                    yield Slot(x, y, sides), index, (taken, tuple(sorted(rest + tuple(new))), left)
+
+    def _key(self, occupied: frozenset, ends: tuple, remaining: tuple[int, ...]) -> tuple:
+        """Return the memo key of a state: the cells the remaining cards can reach, relative to the first end."""
+        # every other end takes at least one card, the last card of a river is at most steps from its end
+        steps = sum(remaining) - len(ends)
+        turns = sum(count for count, turning in zip(remaining, self.turning, strict=True) if turning)
+        x0, y0, _ = ends[0]
+        near = frozenset(
+            (x - x0, y - y0)
+            for x, y in occupied
+            if any(_reachable(x - ex, y - ey, entry, turns, steps) for ex, ey, entry in ends)
+        )
+        return near, tuple((x - x0, y - y0, side) for x, y, side in ends), remaining
+
+    def _count(self, occupied: frozenset, ends: tuple, remaining: tuple[int, ...]) -> int:
+        """Return the number of courses completing a state."""
+        if not ends:
+            return int(not any(remaining))
+        if len(ends) > sum(remaining):
+            return 0
+        key = self._key(occupied, ends, remaining)
+        if key not in self.memo:
+            self.memo[key] = sum(
+                self._count(*state) for _, _, state in self._children(occupied, ends, remaining, self.shapes)
+            )
+        return self.memo[key]
+
+    def _possible(self, occupied: frozenset, ends: tuple, remaining: tuple[int, ...]) -> bool:
+        """Return True if a state can be completed, without counting the courses."""
+        if not ends:
+            return not any(remaining)
+        if len(ends) > sum(remaining):
+            return False
+        key = self._key(occupied, ends, remaining)
+        if key in self.memo:
+            return self.memo[key] > 0
+        if key not in self.possible:
+            self.possible[key] = any(
+                self._possible(*state) for _, _, state in self._children(occupied, ends, remaining, self.shapes)
+            )
+        return self.possible[key]
+
+    def courses(self) -> int:
+        """Return the number of courses, ways to lay out the shapes of the cards."""
+        return self._count(*self._start())
+
+    def count(self) -> int:
+        """Return the number of layouts of the cards."""
+        return self.courses() * math.prod(math.factorial(count) for count in self.counts)
+
+    def _walk(self, state: tuple, course: list[tuple[Slot, int]], rng: random.Random | None) -> Iterator[list]:
+        """Yield the courses completing state after course, trying the ways to continue in random order with rng."""
+        occupied, ends, remaining = state
+        if not ends:
+            yield list(course)
+            return
+        children = [
+            (slot, index, child)
+            for slot, index, child in self._children(occupied, ends, remaining, self.shapes)
+            if self._possible(*child)
+        ]
+        if rng is not None:
+            rng.shuffle(children)
+        for slot, index, child in children:
+            course.append((slot, index))
+            yield from self._walk(child, course, rng)
+            course.pop()
+
+    def _layout(self, course: list[tuple[Slot, int]], rng: random.Random | None = None) -> list[Placement]:
+        """Return the placements of a course, with the cards of each shape in deck order, or shuffled with rng.
+
+        Copies of a card are numbered in the order they are placed.
+        """
+        cards = {form: [] for form in self.shapes}
+        for spec in self.rest:
+            cards[shape(river_sides(spec))].append(spec)
+        if rng is not None:
+            for specs in cards.values():
+                rng.shuffle(specs)
+        queues = {form: iter(specs) for form, specs in cards.items()}
+        copies = {self.start.key: 1}
+        placements = [Placement(self.start.key, 0, 0)]
+        for slot, index in course:
+            spec = next(queues[self.shapes[index]])
+            copies[spec.key] = copies.get(spec.key, 0) + 1
+            base = river_sides(spec)
+            rotation = next(r for r in range(4) if rotate_sides(base, r) == slot.sides)
+            placements.append(Placement(spec.key, slot.x, slot.y, rotation, copies[spec.key]))
+        return placements
+
+    def layouts(self, limit: int | None = None) -> Iterator[list[Placement]]:
+        """Yield the layouts of every course, or of the first limit, each with the cards in deck order."""
+        for n, course in enumerate(self._walk(self._start(), [], None)):
+            if limit is not None and n >= limit:
+                return
+            yield self._layout(course)
+
+    def first(self) -> list[Placement] | None:
+        """Return the first layout, None if there is none."""
+        return next(self.layouts(1), None)
+
+    def sample(self, rng: random.Random | None = None) -> list[Placement] | None:
+        """Return a random layout, None if there is none.
+
+        Every layout can come out, but not equally often: each way to continue the river is
+        equally likely, whatever number of layouts it leads to.
+        """
+        rng = rng or random.Random()
+        course = next(self._walk(self._start(), [], rng), None)
+        return None if course is None else self._layout(course, rng)
+
+
+def river_solver(sets: Iterable[str], without: Iterable[str] = ()) -> RiverSolver:
+    """Return a solver of the river cards in sets, without the cards with the keys in without."""
+    left_out = set(without)
+    return RiverSolver(spec for cardset in sets for spec in catalog().sets[cardset] if spec.key not in left_out)
+
+
+def layout_json(placements: list[Placement]) -> str:
+    """Return placements as JSON, for load_placements() and carcassonne_board."""
+    entries = [{"card": p.key, "x": p.x, "y": p.y, "rotation": p.rotation, "copy": p.copy} for p in placements]
+    return json.dumps(entries, indent=1) + "\n"
+
+
+def save_layout(placements: list[Placement], filename: str) -> None:
+    """Write placements as JSON in filename, see layout_json()."""
+    Path(filename).write_text(layout_json(placements))
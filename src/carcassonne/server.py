@@ -0,0 +1,357 @@
+"""Local HTTP service rendering cards and sheets on request.
+
+All endpoints answer GET and HEAD:
+
+- ``/card/CAR14?copy=2&seed=s``: a card of the catalog
+- ``/card?roads=EW&shield=true&seed=s``: a card from Card arguments, shield may be a number of shields
+- ``/sheet?sets=CAR,RIV&feature=tower AND city&width=5&symbols=true&seed=s``: a sheet of cards
+- ``/metrics``: counters of requests, the cache and rendering, as JSON
+
+Cards are drawn on a pool of worker processes. Every document is named by a
+digest of everything it is drawn from, like the manifest of a build. That
+digest is its ETag and its key in an LRU cache of rendered documents, so a
+repeated request is a cache lookup and a conditional request with a matching
+If-None-Match is answered 304 without rendering at all. Concurrent requests
+for the same document share one rendering.
+
+Request bodies are not used. A body with a Content-Length is read past, so the
+connection can be kept, any other body closes the connection after the answer.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import hashlib
+import io
+import json
+import logging
+import time
+import urllib.parse
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from typing import TYPE_CHECKING
+
+from . import Card, SheetWriter, compact, warm_worker
+from .build import card_digest, card_jobs, draw_card
+from .catalog import FEATURES, catalog, compile_spec
+from .query import QueryError
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from .catalog import CardSpec
+
+SVG_TYPE = "image/svg+xml"
+TRUE = {"1", "true", "yes", "on"}
+# the largest request body read past on a kept connection, a larger one closes it
+MAX_BODY = 1 << 20
+
+
+class HTTPError(Exception):
+    """An error answered with status and message."""
+
+    def __init__(self, status: HTTPStatus, message: str) -> None:
+        """Initialize an error answered with status and message."""
+        super().__init__(message)
+        self.status = status
+
+
+class ResponseCache:
+    """A bounded LRU cache of rendered documents, by key."""
+
+    def __init__(self, maxsize: int = 256) -> None:
+        """Initialize an empty cache of at most maxsize documents."""
+        self.maxsize = maxsize
+        self.evictions = 0
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+
+    def get(self, key: str) -> bytes | None:
+        """Return the document with key, or None."""
+        body = self._entries.get(key)
+        if body is not None:
+            self._entries.move_to_end(key)
+        return body
+
+    def put(self, key: str, body: bytes) -> None:
+        """Store the document body with key, dropping the least recently used if full."""
+        self._entries[key] = body
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict[str, int]:
+        """Return the size of the cache."""
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "bytes": sum(map(len, self._entries.values())),
+            "evictions": self.evictions,
+        }
+
+
+def render_card(name: str, copy: int, spec: CardSpec, seed: str) -> bytes:
+    """Draw one card and return it as a document."""
+    card = Card.from_spec(name, spec, copy=copy, seed=seed)
+    card.render()
+    return compact.tostring(card.tile.getroot())
+
+
+def render_sheet(jobs: list[tuple[str, int, CardSpec]], per_row: int, seed: str, *, symbols: bool) -> bytes:
+    """Draw the cards in jobs on a sheet and return it as a document."""
+    buffer = io.StringIO()
+    with SheetWriter(buffer, len(jobs), per_row, symbols=symbols) as sheet:
+        for n, (name, copy, spec) in enumerate(jobs):
+            drawn = draw_card(name, copy, spec, None, seed, (n, per_row), symbols=symbols)
+            if drawn.placed is None:
+                logging.error(f"Failed to draw {name}: {drawn.error}")
+                sheet.skip()
+            else:
+                sheet.write(drawn.placed, drawn.symbols)
+    return buffer.getvalue().encode()
+
+
+def _digest(*parts: object) -> str:
+    """Return a digest of parts, including the compact precision the documents are written with."""
+    return hashlib.sha256(json.dumps([compact.precision(), *parts]).encode()).hexdigest()
+
+
+def _flag(query: dict[str, str], name: str) -> bool:
+    """Return the boolean query parameter name."""
+    return query.get(name, "").lower() in TRUE
+
+
+def _int(query: dict[str, str], name: str, default: int) -> int:
+    """Return the positive integer query parameter name."""
+    try:
+        value = int(query.get(name, default))
+    except ValueError:
+        value = 0
+    if value < 1:
+        msg = f"{name} must be a positive integer"
+        raise HTTPError(HTTPStatus.BAD_REQUEST, msg)
+    return value
+
+
+def _feature(attr: str, value: str) -> bool | int:
+    """Parse the value of the feature attr, a boolean or for shield also a number of shields like in a catalog."""
+    # 1 stays true, so shield=1 and shield=true draw the same card
+    if attr == "shield" and value.isdigit() and int(value) > 1:
+        return int(value)
+    return value.lower() in TRUE
+
+
+def adhoc_spec(query: dict[str, str]) -> CardSpec:
+    """Compile the Card arguments in query, features are booleans and edges directions."""
+    args = {}
+    for attr, value in query.items():
+        if attr in {"seed", "copy"}:
+            continue
+        args[attr] = _feature(attr, value) if attr in FEATURES else value
+    try:
+        return compile_spec("ADHOC", 0, 1, args)
+    except (AttributeError, ValueError) as e:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, str(e)) from e
+
+
+class TileServer:
+    """Renders the documents of requests, on a pool of worker processes, with a cache."""
+
+    def __init__(self, n_jobs: int = 1, cache_size: int = 256) -> None:
+        """Initialize a server drawing in n_jobs processes and caching cache_size documents."""
+        self.n_jobs = n_jobs
+        self.cache = ResponseCache(cache_size)
+        self.metrics: Counter[str] = Counter()
+        self.render_seconds = 0.0
+        self.pending: dict[str, asyncio.Future[bytes]] = {}
+        self.executor: ProcessPoolExecutor | None = None
+
+    def start(self) -> None:
+        """Start the worker processes."""
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.n_jobs, initializer=warm_worker, initargs=(None, compact.precision())
+        )
+
+    def stop(self) -> None:
+        """Stop the worker processes."""
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+
+    async def render(self, key: str, function: Callable[..., bytes], *args: object) -> bytes:
+        """Return the document key from the cache, or render it with function(*args) in a worker."""
+        body = self.cache.get(key)
+        if body is not None:
+            self.metrics["cache_hits"] += 1
+            return body
+        future = self.pending.get(key)
+        if future is None:
+            self.metrics["cache_misses"] += 1
+            future = asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+            future.add_done_callback(functools.partial(self._rendered, key, start=time.perf_counter()))
+            self.pending[key] = future
+        else:
+            self.metrics["coalesced"] += 1
+        return await asyncio.shield(future)
+
+    def _rendered(self, key: str, future: asyncio.Future[bytes], start: float) -> None:
+        """Cache a finished rendering."""
+        del self.pending[key]
+        self.render_seconds += time.perf_counter() - start
+        if future.cancelled() or future.exception() is not None:
+            self.metrics["render_errors"] += 1
+            return
+        self.metrics["renders"] += 1
+        self.cache.put(key, future.result())
+
+    def route(self, path: str, query: dict[str, str]) -> tuple[str, Callable[..., bytes], tuple]:
+        """Return the key of the document at path and how to render it.
+
+        Raises:
+            HTTPError: If there is no such document or the query is not valid.
+        """
+        seed = query.get("seed", "")
+        if path == "/card" or path.startswith("/card/"):
+            copy = _int(query, "copy", 1)
+            if path == "/card":
+                spec = adhoc_spec(query)
+            else:
+                try:
+                    spec = catalog()[path.removeprefix("/card/")]
+                except KeyError as e:
+                    msg = f"No card {path.removeprefix('/card/')}"
+                    raise HTTPError(HTTPStatus.NOT_FOUND, msg) from e
+            name = f"{spec.key}-{copy}"
+            return _digest(card_digest(copy, spec, seed)), render_card, (name, copy, spec, seed)
+        if path == "/sheet":
+            sets = [cardset for cardset in query.get("sets", "").split(",") if cardset] or list(catalog().sets)
+            unknown = [cardset for cardset in sets if cardset not in catalog().sets]
+            if unknown:
+                msg = f"No set {', '.join(unknown)}"
+                raise HTTPError(HTTPStatus.NOT_FOUND, msg)
+            try:
+                jobs = card_jobs(sets, query.get("feature", ""))
+            except QueryError as e:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, str(e)) from e
+            per_row = _int(query, "width", 5)
+            symbols = _flag(query, "symbols")
+            key = _digest([card_digest(copy, spec, seed) for _, copy, spec in jobs], per_row, symbols)
+            return key, functools.partial(render_sheet, symbols=symbols), (jobs, per_row, seed)
+        msg = f"Nothing at {path}"
+        raise HTTPError(HTTPStatus.NOT_FOUND, msg)
+
+    def report(self) -> dict:
+        """Return the metrics of the server."""
+        return {
+            **self.metrics,
+            "render_seconds": self.render_seconds,
+            "in_flight": len(self.pending),
+            "workers": self.n_jobs,
+            "cache": self.cache.stats(),
+        }
+
+    async def respond(self, method: str, target: str, headers: dict[str, str]) -> tuple[HTTPStatus, dict, bytes]:
+        """Return the status, headers and body answering a request."""
+        if method not in {"GET", "HEAD"}:
+            return HTTPStatus.METHOD_NOT_ALLOWED, {"Allow": "GET, HEAD"}, b""
+        url = urllib.parse.urlsplit(target)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        if url.path == "/metrics":
+            return HTTPStatus.OK, {"Content-Type": "application/json"}, json.dumps(self.report()).encode()
+        try:
+            key, function, args = self.route(url.path, query)
+        except HTTPError as e:
+            return e.status, {"Content-Type": "text/plain"}, str(e).encode()
+
+        etag = f'"{key}"'
+        if etag in (tag.strip() for tag in headers.get("if-none-match", "").split(",")):
+            self.metrics["not_modified"] += 1
+            return HTTPStatus.NOT_MODIFIED, {"ETag": etag}, b""
+        try:
+            body = await self.render(key, function, *args)
+        except Exception as e:
+            logging.exception(f"Failed to render {target}")
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"Content-Type": "text/plain"}, str(e).encode()
+        return HTTPStatus.OK, {"Content-Type": SVG_TYPE, "ETag": etag, "Cache-Control": "no-cache"}, body
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Answer the requests on one connection."""
+        try:
+            while request := await reader.readline():
+                headers = {}
+                while (line := await reader.readline()) not in {b"\r\n", b"\n", b""}:
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    method, target, version = request.decode("latin-1").split()
+                except ValueError:
+                    self._write(writer, HTTPStatus.BAD_REQUEST, {}, b"", keep_alive=False)
+                    break
+                self.metrics["requests"] += 1
+                # bodies are not used, they are read past so the next request starts at its request line
+                readable = await self._skip_body(reader, headers)
+                status, extra, body = await self.respond(method, target, headers)
+                self.metrics[f"status_{status.value}"] += 1
+                keep_alive = readable and version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                self._write(writer, status, extra, body, keep_alive=keep_alive, head=method == "HEAD")
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _skip_body(reader: asyncio.StreamReader, headers: dict[str, str]) -> bool:
+        """Read past the body of a request, return False if its end is unknown and the connection must close."""
+        if "transfer-encoding" in headers:
+            return False
+        length = headers.get("content-length", "0")
+        if not length.isdigit() or int(length) > MAX_BODY:
+            return False
+        try:
+            await reader.readexactly(int(length))
+        except asyncio.IncompleteReadError:
+            return False
+        return True
+
+    @staticmethod
+    def _write(  # noqa: PLR0913
+        writer: asyncio.StreamWriter,
+        status: HTTPStatus,
+        headers: dict[str, str],
+        body: bytes,
+        *,
+        keep_alive: bool,
+        head: bool = False,
+    ) -> None:
+        """Write a response."""
+        lines = [f"HTTP/1.1 {status.value} {status.phrase}"]
+        headers = {**headers, "Content-Length": str(len(body)), "Connection": "keep-alive" if keep_alive else "close"}
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        if not head:
+            writer.write(body)
+
+
+async def _serve(server: TileServer, host: str, port: int) -> None:
+    """Serve requests on host and port until cancelled."""
+    listener = await asyncio.start_server(server.handle, host, port)
+    for sock in listener.sockets:
+        logging.warning(f"Serving tiles on http://{sock.getsockname()[0]}:{sock.getsockname()[1]}/")
+    async with listener:
+        await listener.serve_forever()
+
+
+def serve(host: str = "127.0.0.1", port: int = 8000, n_jobs: int = 1, cache_size: int = 256) -> None:
+    """Serve cards and sheets over HTTP on host and port until interrupted."""
+    server = TileServer(n_jobs, cache_size)
+    server.start()
+    try:
+        asyncio.run(_serve(server, host, port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
@@ -0,0 +1,261 @@
+"""Timing and memory statistics of the stages of drawing cards and sheets.
+
+Statistics are off by default, then stage() hands out one shared do-nothing
+context manager, and tracemalloc is not even imported. After enable() every
+stage records its time, the bytes it reports and, with memory, the peak memory
+tracemalloc sees while it runs. A stage inside another resets the peak of
+tracemalloc and hands the peak it saw to the stage around it, so the peak of
+the outer stage includes it.
+
+collect() gathers the stages of a block, like drawing one card, apart. Its
+recorder belongs to the thread running the block: stages of other threads, like
+the writer threads, are recorded in the statistics of the process. Memory is
+only traced in the main thread, tracemalloc can not tell threads apart.
+
+>>> enable()
+>>> with stage("paths"):
+...     pass
+>>> report()["stages"]["paths"]["count"]
+1
+>>> disable()
+"""
+
+from __future__ import annotations
+
+import contextlib
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import TYPE_CHECKING, Self
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+
+class Recorder:
+    """Collected statistics, by stage."""
+
+    def __init__(self, *, memory: bool = False) -> None:
+        """Initialize an empty recorder, that traces memory if memory."""
+        self.memory = memory
+        self.times: dict[str, list[float]] = defaultdict(list)
+        self.sizes: dict[str, int] = defaultdict(int)
+        self.peaks: dict[str, int] = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def add(self, name: str, seconds: float, size: int = 0, peak: int = 0) -> None:
+        """Record one run of the stage name."""
+        with self.lock:
+            self.times[name].append(seconds)
+            self.sizes[name] += size
+            self.peaks[name] = max(self.peaks[name], peak)
+
+    def merge(self, other: dict) -> None:
+        """Add the statistics in other, as returned by as_dict(), to these."""
+        with self.lock:
+            for name, times in other["times"].items():
+                self.times[name].extend(times)
+            for name, size in other["sizes"].items():
+                self.sizes[name] += size
+            for name, peak in other["peaks"].items():
+                self.peaks[name] = max(self.peaks[name], peak)
+
+    def as_dict(self) -> dict:
+        """Return the raw statistics, in a form that can be pickled and merged."""
+        with self.lock:
+            return {
+                "times": {name: list(times) for name, times in self.times.items()},
+                "sizes": dict(self.sizes),
+                "peaks": dict(self.peaks),
+            }
+
+
+class _Stage:
+    """Context manager timing one run of a stage."""
+
+    __slots__ = ("highest", "memory", "name", "recorder", "size", "start", "traced")
+
+    def __init__(self, recorder: Recorder, name: str) -> None:
+        self.recorder = recorder
+        self.name = name
+        self.size = 0
+        # tracemalloc sees the whole process, the peaks of other threads would mix with those of the main thread
+        self.memory = recorder.memory and threading.current_thread() is threading.main_thread()
+
+    def __enter__(self) -> Self:
+        if self.memory:
+            import tracemalloc
+
+            current, highest = tracemalloc.get_traced_memory()
+            # the peak is reset for this stage, the stage around it keeps what it saw so far
+            if _open:
+                _open[-1].highest = max(_open[-1].highest, highest)
+            tracemalloc.reset_peak()
+            self.traced = self.highest = current
+            _open.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        seconds = time.perf_counter() - self.start
+        peak = 0
+        if self.memory:
+            import tracemalloc
+
+            self.highest = max(self.highest, tracemalloc.get_traced_memory()[1])
+            peak = self.highest - self.traced
+            _open.pop()
+            if _open:
+                _open[-1].highest = max(_open[-1].highest, self.highest)
+        self.recorder.add(self.name, seconds, self.size, peak)
+
+
+class _NoStage:
+    """Context manager doing nothing, used when statistics are off."""
+
+    __slots__ = ()
+    size = 0
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        pass
+
+    def __setattr__(self, name: str, value: object) -> None:
+        pass
+
+
+_no_stage = _NoStage()
+_recorder: Recorder | None = None
+# the recorder of a collect() block, per thread
+_local = threading.local()
+# the stages of the main thread tracing memory that are running, innermost last
+_open: list[_Stage] = []
+
+
+def _current() -> Recorder | None:
+    """Return the recorder of the collect() block this thread is in, else the recorder of the process."""
+    return getattr(_local, "recorder", None) or _recorder
+
+
+def enabled() -> bool:
+    """Return True if statistics are being collected."""
+    return _recorder is not None
+
+
+def memory() -> bool:
+    """Return True if statistics are being collected with memory tracing."""
+    return _recorder is not None and _recorder.memory
+
+
+def enable(*, memory: bool = False) -> None:
+    """Start collecting statistics, tracing memory too if memory."""
+    global _recorder  # noqa: PLW0603
+    _recorder = Recorder(memory=memory)
+    if memory:
+        import tracemalloc
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+
+def disable() -> None:
+    """Stop collecting statistics and drop the collected."""
+    global _recorder  # noqa: PLW0603
+    if _recorder is not None and _recorder.memory:
+        import tracemalloc
+
+        tracemalloc.stop()
+    _recorder = None
+
+
+def stage(name: str) -> _Stage | _NoStage:
+    """Return a context manager recording a run of the stage name.
+
+    Set the size attribute of the returned object to record the number of bytes the stage handled.
+    """
+    recorder = _current()
+    return _no_stage if recorder is None else _Stage(recorder, name)
+
+
+@contextlib.contextmanager
+def collect() -> Iterator[dict]:
+    """Collect the statistics of a block separately, yield a dict that is filled in when it ends.
+
+    Only the stages of this thread are collected, stages of other threads, like the writer
+    threads, go on being recorded as before.
+    """
+    outer = _current()
+    result = {}
+    if outer is None:
+        yield result
+        return
+    previous = getattr(_local, "recorder", None)
+    _local.recorder = recorder = Recorder(memory=outer.memory)
+    try:
+        yield result
+    finally:
+        result.update(recorder.as_dict())
+        _local.recorder = previous
+
+
+def _output_size(sizes: dict[str, int]) -> int:
+    """Return the bytes a block put out, from the bytes of its stages."""
+    if "write" in sizes:
+        return sizes["write"]
+    return sizes.get("serialize", 0)
+
+
+def merge(collected: dict, group: str | None = None) -> None:
+    """Add statistics from collect() to the current, and to group if given.
+
+    The group records the time of the stage "card" of the block, the max of its peaks, and the bytes it wrote,
+    or if it wrote none the bytes it serialized for others to write. The same bytes are often both serialized
+    and written, so the bytes of all stages would count them twice.
+    """
+    recorder = _current()
+    if recorder is None or not collected:
+        return
+    recorder.merge(collected)
+    if group is not None:
+        recorder.add(
+            group,
+            sum(collected["times"].get("card", [])),
+            _output_size(collected["sizes"]),
+            max(collected["peaks"].values(), default=0),
+        )
+
+
+def set_of(name: str) -> str:
+    """Return the group a card called name, like CAR14-2, is counted in."""
+    match = re.match(r"(.*?)\d+-\d+$", name)
+    return f"set:{match.group(1) if match else name}"
+
+
+def _percentile(ordered: list[float], fraction: float) -> float:
+    """Return the fraction percentile of the sorted list ordered."""
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def report() -> dict:
+    """Return a summary of the collected statistics, for each stage and group."""
+    if _recorder is None:
+        return {}
+    summary = {"stages": {}, "sets": {}}
+    for name, times in _recorder.times.items():
+        ordered = sorted(times)
+        section = summary["sets" if name.startswith("set:") else "stages"]
+        section[name.removeprefix("set:")] = {
+            "count": len(times),
+            "total": sum(times),
+            "p50": _percentile(ordered, 0.5),
+            "p90": _percentile(ordered, 0.9),
+            "p99": _percentile(ordered, 0.99),
+            "bytes": _recorder.sizes[name],
+            "peak_memory": _recorder.peaks[name],
+        }
+    if _recorder.memory:
+        summary["peak_memory"] = max(_recorder.peaks.values(), default=0)
+    return summary
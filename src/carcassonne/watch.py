@@ -0,0 +1,170 @@
+"""Watch mode: draw the cards again when the files they are drawn from change.
+
+A DependencyGraph maps every file a tile is drawn from, tile.svg and the
+feature graphics, to the tiles drawn from it. A Watcher polls those files,
+sets.py and the catalog files, and reports changes once they have been quiet
+for a moment, so an editor saving a file in several steps causes one rebuild.
+Only the tiles that depend on a changed file, or whose definition in the sets
+changed, are drawn again. A sheet or archive holds every tile, it is written again when any of its
+tiles changes.
+
+A file that is broken while it is being edited does not stop the watch: the
+cards drawn from it fail, keep their previous files and are drawn again on the
+next change.
+
+>>> from .catalog import catalog
+>>> graph = DependencyGraph([("TOW01-1", 1, catalog()["TOW01"]), ("CAR14-1", 1, catalog()["CAR14"])])
+>>> sorted(graph.affected([GFX_DIR / "Tower.svg"])), sorted(graph.affected([GFX_DIR / "tile.svg"]))
+(['TOW01-1'], ['CAR14-1', 'TOW01-1'])
+"""
+
+from __future__ import annotations
+
+import importlib
+import logging
+import sys
+import time
+from typing import TYPE_CHECKING
+
+from . import GFX_DIR
+from .build import card_assets, draw_cards
+from .catalog import CardSpec, catalog, catalog_files
+from .query import index
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator
+    from pathlib import Path
+
+logger = logging.getLogger()
+
+
+class DependencyGraph:
+    """The tiles of a build and the files each of them is drawn from."""
+
+    def __init__(self, jobs: Iterable[tuple[str, int, CardSpec]]) -> None:
+        """Collect the files of every job, as returned by card_jobs()."""
+        self.jobs = {job[0]: job for job in jobs}
+        self.dependents: dict[Path, set[str]] = {}
+        for name, _, spec in self.jobs.values():
+            for filename in card_assets(spec):
+                self.dependents.setdefault(GFX_DIR / filename, set()).add(name)
+
+    def files(self) -> list[Path]:
+        """Return every file a tile is drawn from."""
+        return list(self.dependents)
+
+    def affected(self, changed: Iterable[Path]) -> set[str]:
+        """Return the names of the tiles drawn from any of the files in changed."""
+        return set().union(*(self.dependents.get(path, ()) for path in changed))
+
+    def redefined(self, jobs: Iterable[tuple[str, int, CardSpec]]) -> set[str]:
+        """Return the names of the tiles in jobs that are new or defined differently than in this graph."""
+        return {job[0] for job in jobs if self.jobs.get(job[0]) != job}
+
+
+class Watcher:
+    """Poll files for changes to their modification time."""
+
+    def __init__(self, paths: Iterable[Path], interval: float = 0.5, debounce: float = 0.2) -> None:
+        """Watch paths.
+
+        Args:
+            paths (Iterable): The files to watch, may be replaced while watching.
+            interval (float): Seconds between polls while nothing changes.
+            debounce (float): Seconds files must be unchanged before a change is reported.
+        """
+        self.paths = list(paths)
+        self.interval = interval
+        self.debounce = debounce
+
+    @staticmethod
+    def _mtime(path: Path) -> int | None:
+        """Return the modification time of path, None if it does not exist."""
+        try:
+            return path.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def snapshot(self) -> dict[Path, int | None]:
+        """Return the modification time of every watched file."""
+        return {path: self._mtime(path) for path in self.paths}
+
+    def changes(self) -> Iterator[set[Path]]:
+        """Yield the files changed since the last change, forever."""
+        before = self.snapshot()
+        while True:
+            time.sleep(self.interval)
+            now = self.snapshot()
+            changed = set()
+            while now != before:
+                changed |= {path for path in now if now[path] != before.get(path)}
+                before = now
+                time.sleep(self.debounce)
+                now = self.snapshot()
+            if changed:
+                yield changed
+                # files watched since the last poll are compared with their current state
+                before = {path: before[path] if path in before else self._mtime(path) for path in self.paths}
+
+
+def reload_sets() -> None:
+    """Read sets.py again, and drop the catalog and index compiled from the old one.
+
+    Raises:
+        Exception: Anything sets.py raises, the old catalog is then kept.
+    """
+    sets = sys.modules.get(f"{__package__}.sets")
+    if sets is not None:
+        importlib.reload(sets)
+    catalog.cache_clear()
+    index.cache_clear()
+
+
+def _rebuild(
+    graph: DependencyGraph, select: Callable[[], list], changed: set[Path], pending: set[str], options: dict
+) -> tuple[DependencyGraph, set[str]]:
+    """Draw the tiles affected by changed and the pending tiles, return the new graph and the failed tiles."""
+    affected = graph.affected(changed) | pending
+    if changed & set(catalog_files()):
+        reload_sets()
+        new = DependencyGraph(select())
+        affected = (affected & new.jobs.keys()) | graph.redefined(new.jobs.values())
+        graph = new
+    if not affected:
+        return graph, set()
+    whole = options.get("sheet") or options.get("archive")
+    jobs = [job for name, job in graph.jobs.items() if whole or name in affected]
+    logging.info(f"{', '.join(sorted(path.name for path in changed))} changed, drawing {len(affected)} tiles")
+    return graph, set(draw_cards(jobs, **options))
+
+
+def watch(
+    select: Callable[[], list[tuple[str, int, CardSpec]]],
+    interval: float = 0.5,
+    debounce: float = 0.2,
+    **options: object,
+) -> None:
+    """Draw the cards selected by select() again whenever the files they are drawn from change, until interrupted.
+
+    Args:
+        select (Callable): Returns the jobs to draw, as card_jobs(), called again when the sets change.
+        interval (float): Seconds between polls for changes.
+        debounce (float): Seconds files must be unchanged before they are drawn again.
+        options (dict): Arguments to draw_cards() other than jobs and force.
+    """
+    graph = DependencyGraph(select())
+    watcher = Watcher([*graph.files(), *catalog_files()], interval, debounce)
+    options = {"force": False, **options}
+    pending: set[str] = set()
+    logging.info(f"Watching {len(watcher.paths)} files for changes")
+    for changed in watcher.changes():
+        try:
+            graph, pending = _rebuild(graph, select, changed, pending, options)
+        except Exception as e:  # noqa: BLE001
+            # a file is missing or sets.py is broken, try again on the next change
+            logging.error(f"Could not draw the changed tiles: {e.__class__.__name__}: {e}")  # noqa: TRY400
+            pending |= graph.affected(changed)
+            continue
+        if pending:
+            logging.warning(f"{len(pending)} tiles failed, they are drawn again on the next change")
+        watcher.paths = [*graph.files(), *catalog_files()]
@@ -0,0 +1,110 @@
+"""Writing drawn cards on background threads, while the next cards are drawn.
+
+A BackgroundWriter hands serialized cards to a sink, any callable taking a
+name and the bytes to store under it, like a TileSink writing the files of a
+directory or ArchiveWriter.add. Cards wait for a writer thread in a bounded
+queue: when the disk is slower than drawing, put() blocks until there is room,
+so no more than a few serialized cards are held in memory. A sink that can only
+be used from one thread at a time, like an archive, gets one writer thread.
+
+Errors of the sink do not stop the writer, they are kept by name in failed, so
+a build can report them once everything is written.
+
+>>> import tempfile
+>>> with tempfile.TemporaryDirectory() as output_dir, BackgroundWriter(TileSink(output_dir)) as writer:
+...     writer.put("CAR01-1", b"<svg/>")
+...     writer.put("CAR01-2", b"<svg/>")
+>>> writer.written, writer.failed
+(2, {})
+"""
+
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Self
+
+from .stats import stage
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+logger = logging.getLogger()
+
+
+class TileSink:
+    """Write cards as name.svg files in a directory."""
+
+    def __init__(self, output_dir: str) -> None:
+        """Write in output_dir, which must exist."""
+        self.output_dir = Path(output_dir)
+
+    def __call__(self, name: str, data: bytes) -> None:
+        """Write the card name, replacing a link left by a deduplicated build instead of writing through it."""
+        path = self.output_dir / f"{name}.svg"
+        with stage("write") as write:
+            path.unlink(missing_ok=True)
+            path.write_bytes(data)
+            write.size = len(data)
+
+
+class BackgroundWriter:
+    """Pass cards to a sink on writer threads, through a bounded queue."""
+
+    def __init__(self, sink: Callable[[str, bytes], None], threads: int = 1, queue_size: int | None = None) -> None:
+        """Prepare to write to sink.
+
+        Args:
+            sink (Callable): Stores a card, called with its name and content.
+            threads (int): The number of writer threads, 0 writes in put().
+            queue_size (int): The number of cards waiting to be written before put() blocks, default 4 per thread.
+        """
+        self.sink = sink
+        self.queue: queue.Queue[tuple[str, bytes] | None] = queue.Queue(queue_size or 4 * max(threads, 1))
+        self.threads = [threading.Thread(target=self._drain, name=f"writer-{n}", daemon=True) for n in range(threads)]
+        self.failed: dict[str, str] = {}
+        self.written = 0
+        self.lock = threading.Lock()
+
+    def __enter__(self) -> Self:
+        """Start the writer threads."""
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        """Wait for every card to be written."""
+        self.close()
+
+    def put(self, name: str, data: bytes) -> None:
+        """Write the card name with content data, waiting while the queue is full."""
+        if self.threads:
+            self.queue.put((name, data))
+        else:
+            self._write(name, data)
+
+    def close(self) -> None:
+        """Write the cards still queued and stop the writer threads."""
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+
+    def _drain(self) -> None:
+        """Write cards from the queue until it hands out None."""
+        while (item := self.queue.get()) is not None:
+            self._write(*item)
+
+    def _write(self, name: str, data: bytes) -> None:
+        """Pass one card to the sink, keeping the error if it fails."""
+        try:
+            self.sink(name, data)
+        except Exception as e:  # noqa: BLE001
+            logging.error(f"Failed to write {name}: {e.__class__.__name__}: {e}")  # noqa: TRY400
+            with self.lock:
+                self.failed[name] = f"{e.__class__.__name__}: {e}"
+        else:
+            with self.lock:
+                self.written += 1